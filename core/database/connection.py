@@ -10,6 +10,11 @@ from typing import Optional, Dict, Any
 import logging
 from core.config import Config
 
+try:
+    import orjson
+except ImportError:  # optional accelerator, stdlib json is used otherwise
+    orjson = None
+
 logger = logging.getLogger(__name__)
 
 class DatabaseConnection:
@@ -31,6 +36,10 @@ class DatabaseConnection:
                 cursor_factory=psycopg2.extras.RealDictCursor
             )
             self.connection.autocommit = False
+            # Decode JSONB columns (parsed_data, metadata) with orjson when it is
+            # installed; registered on this connection only, not process-wide
+            if orjson is not None:
+                psycopg2.extras.register_default_jsonb(conn_or_curs=self.connection, loads=orjson.loads)
             logger.info(f"Connected to PostgreSQL: {self.config.DB_NAME}@{self.config.DB_HOST}")
             return True
         except psycopg2.Error as e:
@@ -92,22 +101,28 @@ class DatabaseConnection:
             self.connection.commit()
             return cursor.rowcount
     
-    def test_connection(self) -> Dict[str, Any]:
-        """Test database connection and return status info"""
+    def test_connection(self, keep_open: bool = False) -> Dict[str, Any]:
+        """Test database connection and return status info
+        
+        An already open, working connection is reused. With keep_open the
+        connection is left open for the caller's next queries instead of closed.
+        """
         try:
-            if not self.connect():
-                return {"status": "failed", "error": "Connection failed"}
+            if not self.is_connected():
+                self.disconnect()
+                if not self.connect():
+                    return {"status": "failed", "error": "Connection failed"}
             
-            # Test basic query
-            result = self.execute_query("SELECT version()")
-            version = result[0]['version'] if result else "Unknown"
-            
-            # Test table existence
-            tables_result = self.execute_query("""
-                SELECT table_name FROM information_schema.tables 
-                WHERE table_schema = 'public' AND table_name IN ('broker_reports', 'import_log')
+            # Server version and table existence in one round trip
+            result = self.execute_query("""
+                SELECT version() AS version,
+                       ARRAY(
+                           SELECT table_name::text FROM information_schema.tables
+                           WHERE table_schema = 'public' AND table_name IN ('broker_reports', 'import_log')
+                       ) AS existing_tables
             """)
-            existing_tables = [row['table_name'] for row in tables_result]
+            version = result[0]['version'] if result else "Unknown"
+            existing_tables = list(result[0]['existing_tables']) if result else []
             
             return {
                 "status": "success",
@@ -120,7 +135,8 @@ class DatabaseConnection:
         except Exception as e:
             return {"status": "error", "error": str(e)}
         finally:
-            self.disconnect()
+            if not keep_open:
+                self.disconnect()
 
 # Global connection instance
 db_connection = DatabaseConnection()
@@ -6,7 +6,7 @@ CRUD operations and business logic for PostgreSQL + JSONB storage
 import json
 import hashlib
 from datetime import datetime
-from typing import List, Dict, Any, Optional, Tuple
+from typing import List, Dict, Any, Optional, Tuple, Iterator
 import logging
 from core.database.connection import db_connection
 
@@ -111,16 +111,31 @@ class BrokerReportOperations:
             logger.error(f"Failed to get report by triple: {e}")
             return None
     
+    # Metadata columns a listing may select (never the HTML or parsed payloads)
+    REPORT_LIST_COLUMNS = ('id', 'broker', 'account', 'period', 'report_date', 'client_name',
+                           'file_name', 'file_hash', 'processing_status', 'created_at', 'updated_at')
+    
+    # What list_reports selects when no projection is given
+    DEFAULT_LIST_COLUMNS = ('id', 'broker', 'account', 'period', 'report_date', 'client_name',
+                            'file_name', 'processing_status', 'created_at', 'updated_at')
+    
     def list_reports(self, 
                      broker: str = None,
                      period: str = None,
                      status: str = None,
                      account: str = None,
                      search_account: str = None,
+                     file_name_like: str = None,
                      limit: int = 100,
-                     offset: int = 0) -> List[Dict]:
-        """List reports with optional filtering"""
+                     offset: int = 0,
+                     columns: List[str] = None) -> List[Dict]:
+        """List reports with optional filtering
+        
+        ``columns`` narrows the selected columns to a subset of REPORT_LIST_COLUMNS.
+        """
         try:
+            select_list = ", ".join(self._report_columns(columns or self.DEFAULT_LIST_COLUMNS))
+            
             conditions = []
             params = []
             
@@ -144,12 +159,15 @@ class BrokerReportOperations:
                 conditions.append("account ILIKE %s")
                 params.append(f"%{search_account}%")
             
+            if file_name_like:
+                conditions.append("file_name LIKE %s")
+                params.append(file_name_like)
+            
             where_clause = "WHERE " + " AND ".join(conditions) if conditions else ""
             params.extend([limit, offset])
             
             query = f"""
-                SELECT id, broker, account, period, report_date, client_name, 
-                       file_name, processing_status, created_at, updated_at
+                SELECT {select_list}
                 FROM broker_reports 
                 {where_clause}
                 ORDER BY created_at DESC
@@ -163,6 +181,116 @@ class BrokerReportOperations:
             logger.error(f"Failed to list reports: {e}")
             return []
     
+    def _report_columns(self, columns: List[str]) -> List[str]:
+        """Validate a column projection against REPORT_LIST_COLUMNS, always including id"""
+        columns = list(columns)
+        unknown = set(columns) - set(self.REPORT_LIST_COLUMNS)
+        if unknown:
+            raise ValueError(f"Unknown report columns: {sorted(unknown)}")
+        if 'id' not in columns:
+            columns.insert(0, 'id')
+        return columns
+    
+    def get_reports_by_ids(self, ids: List[int], columns: List[str] = None) -> Dict[int, Dict]:
+        """Get many reports in one query, keyed by id
+        
+        Use instead of calling get_report() per id, which costs one round trip
+        per report (the N+1 query pattern). ``columns`` selects a subset of
+        REPORT_LIST_COLUMNS (id is always included). Missing ids are absent.
+        """
+        if not ids:
+            return {}
+        columns = self._report_columns(columns or self.DEFAULT_LIST_COLUMNS)
+        try:
+            query = f"SELECT {', '.join(columns)} FROM broker_reports WHERE id = ANY(%s)"
+            result = self.db.execute_query(query, (list(ids),))
+            return {row['id']: dict(row) for row in result}
+        except Exception as e:
+            logger.error(f"Failed to get reports by ids: {e}")
+            return {}
+    
+    def iter_reports(self, columns: List[str] = None, batch_size: int = 5000) -> Iterator[Dict]:
+        """Yield every report in id order, fetching ``batch_size`` rows at a time
+        
+        Uses keyset pagination on id, so memory stays bounded by one batch.
+        ``columns`` selects a subset of REPORT_LIST_COLUMNS (id is always included).
+        Query errors are logged and re-raised so callers never see a truncated table.
+        """
+        columns = self._report_columns(columns or self.REPORT_LIST_COLUMNS)
+        
+        query = f"""
+            SELECT {", ".join(columns)}
+            FROM broker_reports
+            WHERE id > %s
+            ORDER BY id
+            LIMIT %s
+        """
+        last_id = 0
+        while True:
+            try:
+                rows = self.db.execute_query(query, (last_id, batch_size))
+            except Exception as e:
+                logger.error(f"Failed to iterate reports after id {last_id}: {e}")
+                raise
+            for row in rows:
+                yield dict(row)
+            if len(rows) < batch_size:
+                return
+            last_id = rows[-1]['id']
+    
+    def get_field_coverage(self, fields: List[str], broker: str = None, limit: int = 100,
+                           parser_version: str = None) -> Dict[str, Any]:
+        """Count per-field key presence over the latest parsed reports in one aggregate query
+        
+        A key holding JSON null counts as present. Returns total_reports,
+        parser_version_count (reports whose parsed_data parser_version equals
+        ``parser_version``) and field_present ({field: report count}).
+        """
+        try:
+            conditions = ["parsed_data IS NOT NULL"]
+            params = []
+            
+            if broker:
+                conditions.append("broker = %s")
+                params.append(broker)
+            
+            params = [*params, limit, parser_version, list(fields)]
+            
+            query = f"""
+                WITH sample AS (
+                    SELECT parsed_data
+                    FROM broker_reports
+                    WHERE {" AND ".join(conditions)}
+                    ORDER BY created_at DESC
+                    LIMIT %s
+                ),
+                totals AS (
+                    SELECT COUNT(*) AS total_reports,
+                           COUNT(*) FILTER (WHERE parsed_data->>'parser_version' = %s) AS parser_version_count
+                    FROM sample
+                )
+                SELECT t.total_reports, t.parser_version_count, f.field,
+                       COUNT(s.parsed_data) FILTER (WHERE s.parsed_data ? f.field) AS present
+                FROM totals t
+                LEFT JOIN unnest(%s::text[]) AS f(field) ON TRUE
+                LEFT JOIN sample s ON TRUE
+                GROUP BY t.total_reports, t.parser_version_count, f.field
+            """
+            
+            result = self.db.execute_query(query, params)
+            if not result:
+                return {"total_reports": 0, "parser_version_count": 0, "field_present": {}}
+            
+            return {
+                "total_reports": result[0]['total_reports'],
+                "parser_version_count": result[0]['parser_version_count'],
+                "field_present": {row['field']: row['present'] for row in result if row['field'] is not None}
+            }
+            
+        except Exception as e:
+            logger.error(f"Failed to get field coverage: {e}")
+            return {}
+    
     def update_report_status(self, report_id: int, status: str, 
                            parsed_data: Dict = None, error_log: str = None, 
                            parser_version: str = None) -> bool:
@@ -306,6 +434,22 @@ class BrokerReportOperations:
             logger.error(f"Failed to log import file: {e}")
             return 0
     
+    def record_verification_run(self, check_name: str, stats: Dict[str, Any]) -> Optional[int]:
+        """Store one verification run's stats in verification_runs and return its ID"""
+        try:
+            query = """
+                INSERT INTO verification_runs (check_name, stats)
+                VALUES (%s, %s::jsonb)
+                RETURNING id
+            """
+            with self.db.get_cursor() as cursor:
+                cursor.execute(query, (check_name, json.dumps(stats, default=str)))
+                self.db.connection.commit()
+                return cursor.fetchone()['id']
+        except Exception as e:
+            logger.error(f"Failed to record verification run: {e}")
+            return None
+    
     def count_reports(self) -> int:
         """Count total reports in database"""
         try:
@@ -346,6 +490,109 @@ class BrokerReportOperations:
             logger.error(f"Failed to count reports with parsed data: {e}")
             return 0
     
+    def count_consistency_stats(self) -> Dict[str, int]:
+        """Count total, hashed, parsed-status and parsed_data reports in a single scan"""
+        try:
+            query = """
+                SELECT COUNT(*) AS total,
+                       COUNT(file_hash) AS with_hash,
+                       COUNT(*) FILTER (WHERE processing_status = 'parsed') AS parsed,
+                       COUNT(parsed_data) AS with_parsed_data
+                FROM broker_reports
+            """
+            result = self.db.execute_query(query)
+            return dict(result[0]) if result else {}
+        except Exception as e:
+            logger.error(f"Failed to count consistency stats: {e}")
+            return {}
+    
+    def summary_counts(self) -> Dict[str, Any]:
+        """Count reports by account, by period and per filled-in field in one grouped query
+        
+        Returns total, has_broker, has_account, has_period, has_hash, has_filename,
+        status_raw, by_account ({account: count}) and by_period ({period: count}).
+        Empty strings count as missing, like NULLs.
+        """
+        try:
+            query = """
+                SELECT GROUPING(account) AS all_accounts, GROUPING(period) AS all_periods,
+                       account, period,
+                       COUNT(*) AS total,
+                       COUNT(*) FILTER (WHERE broker <> '') AS has_broker,
+                       COUNT(*) FILTER (WHERE account <> '') AS has_account,
+                       COUNT(*) FILTER (WHERE period <> '') AS has_period,
+                       COUNT(*) FILTER (WHERE file_hash <> '') AS has_hash,
+                       COUNT(*) FILTER (WHERE file_name <> '') AS has_filename,
+                       COUNT(*) FILTER (WHERE processing_status = 'raw') AS status_raw
+                FROM broker_reports
+                GROUP BY GROUPING SETS ((account), (period), ())
+            """
+            counts = {'total': 0, 'has_broker': 0, 'has_account': 0, 'has_period': 0,
+                      'has_hash': 0, 'has_filename': 0, 'status_raw': 0,
+                      'by_account': {}, 'by_period': {}}
+            for row in self.db.execute_query(query):
+                if row['all_accounts'] and row['all_periods']:
+                    counts.update({key: row[key] for key in counts if key in row})
+                elif row['all_periods']:
+                    counts['by_account'][row['account']] = row['total']
+                else:
+                    counts['by_period'][row['period']] = row['total']
+            return counts
+        except Exception as e:
+            logger.error(f"Failed to compute summary counts: {e}")
+            return {}
+    
+    def get_semantic_duplicate_groups(self) -> List[Dict]:
+        """Group parsed reports by parsed_data broker/account_number/period_start/period_end
+        
+        Returns only keys shared by more than one report, each with ids (newest
+        first) and count. Reports missing any of the four fields are ignored.
+        """
+        try:
+            query = """
+                SELECT parsed_data->>'broker' AS broker,
+                       parsed_data->>'account_number' AS account_number,
+                       parsed_data->>'period_start' AS period_start,
+                       parsed_data->>'period_end' AS period_end,
+                       array_agg(id ORDER BY created_at DESC) AS ids,
+                       COUNT(*) AS count
+                FROM broker_reports
+                WHERE parsed_data IS NOT NULL  -- lets the planner use ux_semantic_duplicate
+                  AND parsed_data->>'broker' IS NOT NULL
+                  AND parsed_data->>'account_number' IS NOT NULL
+                  AND parsed_data->>'period_start' IS NOT NULL
+                  AND parsed_data->>'period_end' IS NOT NULL
+                GROUP BY 1, 2, 3, 4
+                HAVING COUNT(*) > 1
+                ORDER BY MAX(created_at) DESC
+            """
+            result = self.db.execute_query(query)
+            return [dict(row) for row in result]
+        except Exception as e:
+            logger.error(f"Failed to get semantic duplicate groups: {e}")
+            return []
+    
+    def get_period_mismatches(self) -> List[Dict]:
+        """Reports whose period differs from the YYYY-MM prefix of parsed_data period_start
+        
+        Reports without a string period_start of at least 7 characters are not checked.
+        """
+        try:
+            query = """
+                SELECT id, file_name, period,
+                       left(parsed_data->>'period_start', 7) AS parsed_period
+                FROM broker_reports
+                WHERE jsonb_typeof(parsed_data->'period_start') = 'string'
+                  AND length(parsed_data->>'period_start') >= 7
+                  AND period IS DISTINCT FROM left(parsed_data->>'period_start', 7)
+                ORDER BY created_at DESC
+            """
+            result = self.db.execute_query(query)
+            return [dict(row) for row in result]
+        except Exception as e:
+            logger.error(f"Failed to get period mismatches: {e}")
+            return []
+    
     def count_import_log_entries(self) -> int:
         """Count import log entries"""
         try:
@@ -387,6 +634,73 @@ class BrokerReportOperations:
             logger.error(f"Failed to delete report: {e}")
             return False
     
+    def self_test_roundtrip(self, broker: str, period: str, file_name: str,
+                            html_content: str, metadata: Dict = None) -> Optional[Dict]:
+        """Insert, update, read back and delete a throwaway report in one round trip
+        
+        The statements are sent as one batch in a single transaction. Returns the
+        deleted row (id, processing_status, parsed_data) as it was after the
+        update, or None if any step failed.
+        """
+        try:
+            query = """
+                INSERT INTO broker_reports
+                (broker, period, file_name, file_hash, html_content, metadata, processing_status)
+                VALUES (%s, %s, %s, %s, %s, %s, 'raw');
+                
+                UPDATE broker_reports
+                SET processing_status = 'parsed', parsed_data = %s,
+                    updated_at = NOW(), processed_at = NOW()
+                WHERE id = currval(pg_get_serial_sequence('broker_reports', 'id'));
+                
+                DELETE FROM broker_reports
+                WHERE id = currval(pg_get_serial_sequence('broker_reports', 'id'))
+                RETURNING id, processing_status, parsed_data
+            """
+            params = (
+                broker, period, file_name,
+                hashlib.sha256(html_content.encode('utf-8')).hexdigest(),
+                html_content, json.dumps(metadata or {}, default=str),
+                json.dumps({'self_test': True})
+            )
+            with self.db.get_cursor() as cursor:
+                cursor.execute(query, params)
+                row = cursor.fetchone()
+                self.db.connection.commit()
+                return dict(row) if row else None
+        except Exception as e:
+            logger.error(f"Database self-test round trip failed: {e}")
+            return None
+    
+    def delete_reports_matching(self, file_name_like: str, broker: str = None,
+                                period: str = None) -> List[int]:
+        """Delete reports whose file_name matches a LIKE pattern in one statement
+        
+        Returns the ids of the deleted reports.
+        """
+        try:
+            conditions = ["file_name LIKE %s"]
+            params = [file_name_like]
+            
+            if broker:
+                conditions.append("broker = %s")
+                params.append(broker)
+            
+            if period:
+                conditions.append("period = %s")
+                params.append(period)
+            
+            query = f"DELETE FROM broker_reports WHERE {' AND '.join(conditions)} RETURNING id"
+            with self.db.get_cursor() as cursor:
+                cursor.execute(query, tuple(params))
+                deleted_ids = [row['id'] for row in cursor.fetchall()]
+                self.db.connection.commit()
+            logger.info(f"Deleted {len(deleted_ids)} reports matching {file_name_like}")
+            return deleted_ids
+        except Exception as e:
+            logger.error(f"Failed to delete reports matching {file_name_like}: {e}")
+            return []
+    
     def update_report_parsed_data(self, report_id: int, parsed_data: Dict, status: str = 'parsed') -> bool:
         """Update report's parsed data and status"""
         try:
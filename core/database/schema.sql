@@ -61,6 +61,14 @@ CREATE TABLE IF NOT EXISTS import_log (
     duration_seconds INTEGER
 );
 
+-- Stats recorded by each run of a verification script
+CREATE TABLE IF NOT EXISTS verification_runs (
+    id SERIAL PRIMARY KEY,
+    check_name VARCHAR(50) NOT NULL, -- e.g., semantic_duplicates
+    stats JSONB NOT NULL,
+    created_at TIMESTAMP DEFAULT NOW()
+);
+
 -- Indexes for performance
 CREATE INDEX IF NOT EXISTS idx_broker_reports_broker_period ON broker_reports(broker, period);
 CREATE INDEX IF NOT EXISTS idx_broker_reports_status ON broker_reports(processing_status);
@@ -70,6 +78,12 @@ CREATE INDEX IF NOT EXISTS idx_broker_reports_file_hash ON broker_reports(file_h
 CREATE UNIQUE INDEX IF NOT EXISTS ux_broker_reports_broker_account_period
     ON broker_reports (broker, COALESCE(account, '∅'), period);
 
+-- Partial index holding only malformed periods (expected YYYY-MM), so integrity
+-- checks can list offenders without scanning the table
+CREATE INDEX IF NOT EXISTS idx_broker_reports_invalid_period
+    ON broker_reports (id)
+    WHERE period !~ '^[0-9]{4}-[0-9]{2}$';
+
 -- Semantic duplicate index on parsed_data fields for deep validation
 CREATE UNIQUE INDEX IF NOT EXISTS ux_semantic_duplicate 
     ON broker_reports ((parsed_data->>'broker'), (parsed_data->>'account_number'), (parsed_data->>'period_start'), (parsed_data->>'period_end')) 
@@ -86,6 +100,9 @@ CREATE INDEX IF NOT EXISTS idx_import_log_status ON import_log(status);
 CREATE INDEX IF NOT EXISTS idx_import_log_file_hash ON import_log(file_hash);
 CREATE INDEX IF NOT EXISTS idx_import_log_broker_period ON import_log(broker, period);
 
+-- Verification runs index
+CREATE INDEX IF NOT EXISTS idx_verification_runs_check_created ON verification_runs(check_name, created_at);
+
 -- Function to update updated_at timestamp
 CREATE OR REPLACE FUNCTION update_updated_at_column()
 RETURNS TRIGGER AS $$
@@ -107,3 +124,4 @@ COMMENT ON COLUMN broker_reports.parsed_data IS 'Structured data extracted from
 COMMENT ON COLUMN broker_reports.metadata IS 'Additional metadata and processing info (JSONB)';
 COMMENT ON COLUMN broker_reports.processing_status IS 'Report processing status: raw, processing, parsed, error';
 COMMENT ON COLUMN broker_reports.file_hash IS 'SHA-256 hash for deduplication';
+COMMENT ON TABLE verification_runs IS 'Per-run stats of verification scripts (JSONB)';
@@ -158,6 +158,10 @@ class EnhancedReportImporter:
         self.db_ops = BrokerReportOperations()
         self.file_manager = FileManager()
         self.broker_patterns = load_broker_patterns()
+        self.reset_stats()
+    
+    def reset_stats(self):
+        """Zero the per-run counters reported by import_reports"""
         self.stats = {
             'files_processed': 0,
             'files_success': 0,
@@ -607,6 +611,9 @@ class EnhancedReportImporter:
         """Enhanced import function with better error handling"""
         logger.info(f"Starting enhanced import from {source} (broker: {broker or 'all'})")
         
+        # Counters describe this run only, even when the importer is reused
+        self.reset_stats()
+        
         # Determine source path
         if source == "inbox":
             source_path = self.config.INBOX_PATH
@@ -734,7 +741,7 @@ class EnhancedReportImporter:
                 for error in self.stats['errors'][:5]:  # Show first 5 errors
                     console.print(f"  - {error}")
 
-def main():
+def main(argv: Optional[List[str]] = None):
     """Enhanced main CLI function"""
     parser = argparse.ArgumentParser(description="Enhanced import broker reports into PostgreSQL database")
     parser.add_argument("--source", default="inbox", help="Source directory (default: inbox)")
@@ -742,7 +749,7 @@ def main():
     parser.add_argument("--dry-run", action="store_true", help="Show what would be processed without importing")
     parser.add_argument("--stats", action="store_true", help="Show database statistics")
     
-    args = parser.parse_args()
+    args = parser.parse_args(argv)
     
     # Show database statistics
     if args.stats:
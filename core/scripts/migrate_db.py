@@ -172,6 +172,68 @@ class DatabaseMigrator:
             self.db.connection.rollback()
             return False
 
+    def add_invalid_period_index(self) -> bool:
+        """Add partial index over records whose period is not YYYY-MM"""
+        try:
+            console.print(f"\n[yellow]Adding invalid period index...[/yellow]")
+            
+            # Matches the predicate used by verify_db_integrity.py, so the planner
+            # can answer its invalid-period lookups from this index alone
+            create_index_query = """
+                CREATE INDEX IF NOT EXISTS idx_broker_reports_invalid_period
+                ON broker_reports (id)
+                WHERE period !~ '^[0-9]{4}-[0-9]{2}$'
+            """
+            
+            with self.db.get_cursor() as cursor:
+                cursor.execute(create_index_query)
+                cursor.execute("ANALYZE broker_reports")
+            
+            # Commit changes
+            self.db.connection.commit()
+            console.print(f"[green]✅ Invalid period index ready[/green]")
+            return True
+            
+        except Exception as e:
+            logger.error(f"Failed to create invalid period index: {e}")
+            self.migration_stats['errors'].append(f"Index creation failed: {e}")
+            self.db.connection.rollback()
+            return False
+
+    def add_verification_runs_table(self) -> bool:
+        """Add table holding per-run stats of verification scripts"""
+        try:
+            console.print(f"\n[yellow]Adding verification_runs table...[/yellow]")
+            
+            # Same definition as core/database/schema.sql
+            create_table_query = """
+                CREATE TABLE IF NOT EXISTS verification_runs (
+                    id SERIAL PRIMARY KEY,
+                    check_name VARCHAR(50) NOT NULL,
+                    stats JSONB NOT NULL,
+                    created_at TIMESTAMP DEFAULT NOW()
+                )
+            """
+            create_index_query = """
+                CREATE INDEX IF NOT EXISTS idx_verification_runs_check_created
+                ON verification_runs (check_name, created_at)
+            """
+            
+            with self.db.get_cursor() as cursor:
+                cursor.execute(create_table_query)
+                cursor.execute(create_index_query)
+            
+            # Commit changes
+            self.db.connection.commit()
+            console.print(f"[green]✅ verification_runs table ready[/green]")
+            return True
+            
+        except Exception as e:
+            logger.error(f"Failed to create verification_runs table: {e}")
+            self.migration_stats['errors'].append(f"Table creation failed: {e}")
+            self.db.connection.rollback()
+            return False
+
     def validate_migration(self) -> bool:
         """Validate that migration was successful"""
         try:
@@ -286,6 +348,16 @@ The system is ready for multi-broker support.
                 console.print(f"[red]Index creation failed[/red]")
                 return False
             
+            # 3b. Add invalid period index
+            if not self.add_invalid_period_index():
+                console.print(f"[red]Index creation failed[/red]")
+                return False
+            
+            # 3c. Add verification_runs table
+            if not self.add_verification_runs_table():
+                console.print(f"[red]Table creation failed[/red]")
+                return False
+            
             # 4. Validate migration
             if not self.validate_migration():
                 console.print(f"[red]Migration validation failed[/red]")
@@ -6,7 +6,7 @@ CLI tool to parse raw broker reports and extract structured data
 import sys
 from pathlib import Path
 import argparse
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Optional
 
 # Add project root to Python path
 project_root = Path(__file__).parent.parent.parent.parent
@@ -105,14 +105,14 @@ def parse_single_report(report: Dict[str, Any], ops: BrokerReportOperations) ->
         return False
 
 
-def main():
+def main(argv: Optional[List[str]] = None):
     parser = argparse.ArgumentParser(description="Parse raw broker reports")
     parser.add_argument("--filter", action="append", help="key=value; broker, period, status, account", dest="filters")
     parser.add_argument("--search", action="append", help="key=value; supports account", dest="search")
     parser.add_argument("--report-id", type=int, help="Parse specific report by ID")
     parser.add_argument("--dry-run", action="store_true", help="Show what would be parsed without actually parsing")
     parser.add_argument("--limit", type=int, default=100, help="Maximum number of reports to process")
-    args = parser.parse_args()
+    args = parser.parse_args(argv)
 
     # Ensure directories exist
     config = Config()
@@ -3,10 +3,11 @@
 CLI tool to query broker reports with flexible filters
 """
 
+import io
 import sys
 from pathlib import Path
 import argparse
-from typing import Dict, Any
+from typing import Dict, Any, List, Optional, Tuple
 
 # Add project root to Python path
 project_root = Path(__file__).parent.parent.parent.parent
@@ -88,14 +89,14 @@ def show_field(field_name: str, parsed_data: dict, console: Console):
         console.print("Available fields: balance_ending, account_open_date, trade_count, instruments, result")
 
 
-def main():
+def main(argv: Optional[List[str]] = None, console: Optional[Console] = None):
     parser = argparse.ArgumentParser(description="Query broker reports")
     parser.add_argument("--filter", action="append", help="key=value; broker, period, status, account", dest="filters")
     parser.add_argument("--search", action="append", help="key=value; supports account", dest="search")
     parser.add_argument("--show", help="Show specific field from parsed_data: balance_ending, account_open_date, trade_count, instruments, result")
     parser.add_argument("--limit", type=int, default=100)
     parser.add_argument("--offset", type=int, default=0)
-    args = parser.parse_args()
+    args = parser.parse_args(argv)
 
     # Ensure directories exist before any DB operations
     config = Config()
@@ -120,7 +121,7 @@ def main():
         offset=args.offset,
     )
 
-    console = Console()
+    console = console or Console()
     
     # Handle --show parameter for specific field extraction
     if args.show:
@@ -165,8 +166,30 @@ def main():
         console.print(table)
 
 
+def exit_code(ok) -> int:
+    """Process exit code for main()'s return value, as the script entry point reports it"""
+    return 0 if ok is None else (0 if ok else 1)
+
+def run(argv: List[str]) -> Tuple[int, str]:
+    """Run the CLI in-process and return (exit_code, captured_output)
+    
+    The code matches what running the script would exit with, so callers
+    see the same result as when it was invoked as a subprocess.
+    """
+    buffer = io.StringIO()
+    console = Console(file=buffer, width=200)
+    try:
+        code = exit_code(main(argv, console))
+    except SystemExit as e:
+        # argparse errors and --help exit through SystemExit
+        code = 0 if e.code is None else int(e.code)
+    except Exception as e:
+        console.print(f"Error: {e}")
+        code = 1
+    return code, buffer.getvalue()
+
+
 if __name__ == "__main__":
-    ok = main()
-    sys.exit(0 if ok is None else (0 if ok else 1))
+    sys.exit(exit_code(main()))
 
 
@@ -4,12 +4,12 @@ Script to fix invalid period values in broker_reports table
 Identifies and corrects records with period outside 2000-01 to 2025-12 range
 """
 
+import io
 import sys
 from pathlib import Path
 import argparse
 from datetime import datetime
-from typing import List, Dict, Any, Optional
-import re
+from typing import List, Dict, Any, Optional, Tuple
 
 # Add project root to Python path
 project_root = Path(__file__).parent.parent.parent.parent
@@ -18,20 +18,9 @@ sys.path.insert(0, str(project_root))
 from core.database.operations import BrokerReportOperations
 from core.config import Config
 
-
-def validate_date_format(date_str: str) -> bool:
-    """Validate YYYY-MM-DD format"""
-    if not date_str:
-        return False
-    pattern = r'^\d{4}-\d{2}-\d{2}$'
-    return bool(re.match(pattern, date_str))
-
-
-def extract_period_from_date(date_str: str) -> Optional[str]:
-    """Extract YYYY-MM from YYYY-MM-DD date string"""
-    if not validate_date_format(date_str):
-        return None
-    return date_str[:7]  # YYYY-MM
+# Sentinel years used to park records whose corrected period is already taken
+SENTINEL_YEAR_MAX = 9999
+SENTINEL_YEAR_MIN = 9900
 
 
 def is_valid_period(period: str) -> bool:
@@ -52,11 +41,18 @@ def log_change(log_file: Path, report_id: int, old_period: str, new_period: str,
 
 
 def find_invalid_records(ops: BrokerReportOperations) -> List[Dict]:
-    """Find records with invalid period values"""
+    """Find records with invalid period values
+    
+    extracted_period holds YYYY-MM from a YYYY-MM-DD period_start, or NULL when
+    period_start is malformed, so no date validation is needed in Python.
+    """
     query = """
         SELECT id, broker, account, period, file_name, 
                parsed_data ->> 'period_start' AS period_start,
                parsed_data ->> 'period_end' AS period_end,
+               CASE WHEN parsed_data ->> 'period_start' ~ '^[0-9]{4}-[0-9]{2}-[0-9]{2}$'
+                    THEN substring(parsed_data ->> 'period_start' from 1 for 7)
+               END AS extracted_period,
                parser_version
         FROM broker_reports 
         WHERE (period < '2000-01' OR period > '2025-12')
@@ -69,110 +65,103 @@ def find_invalid_records(ops: BrokerReportOperations) -> List[Dict]:
     return ops.execute_raw_query(query)
 
 
-def check_duplicate_period(ops: BrokerReportOperations, broker: str, account: str, period: str, exclude_id: int) -> bool:
-    """Check if a broker/account/period combination already exists (excluding given ID)"""
-    query = """
-        SELECT COUNT(*) as count
+def find_claimed_periods(ops: BrokerReportOperations, periods: List[str]) -> Dict[Tuple, int]:
+    """Map (broker, account, period) -> id for rows holding any of the given periods or a sentinel"""
+    query = f"""
+        SELECT id, broker, account, period
         FROM broker_reports 
-        WHERE broker = %s AND account = %s AND period = %s AND id != %s
+        WHERE period = ANY(%s) OR period >= '{SENTINEL_YEAR_MIN}-01'
     """
-    result = ops.execute_raw_query(query, (broker, account, period, exclude_id))
-    return result[0]['count'] > 0 if result else False
+    result = ops.execute_raw_query(query, (periods,))
+    return {(row['broker'], row['account'], row['period']): row['id'] for row in result}
 
 
-def fix_record_period(ops: BrokerReportOperations, record: Dict, log_file: Path) -> bool:
-    """Fix period for a single record"""
+def plan_record_fix(record: Dict, claimed: Dict[Tuple, int], log_file: Path) -> Tuple[bool, Optional[str]]:
+    """Decide the corrected period for a single record and log the decision
+    
+    ``claimed`` maps (broker, account, period) to the id holding it and is
+    updated in place, so records must be planned in a deterministic (id) order
+    for collisions inside the batch to resolve the same way on every run.
+    Returns (success, period_to_write); period_to_write is None when nothing
+    has to be written for this record.
+    """
     report_id = record['id']
     old_period = record['period']
-    period_start = record['period_start']
+    new_period = record['extracted_period']
     filename = record['file_name']
     broker = record['broker']
     account = record['account']
     
-    # Extract corrected period from period_start
-    new_period = extract_period_from_date(period_start)
-    
     if not new_period:
         log_change(log_file, report_id, old_period, "FAILED", 
                   "Invalid period_start format", filename)
-        return False
+        return False, None
     
     if not is_valid_period(new_period):
         log_change(log_file, report_id, old_period, "FAILED", 
                   f"Extracted period {new_period} outside valid range", filename)
-        return False
+        return False, None
     
     if new_period == old_period:
         log_change(log_file, report_id, old_period, "SKIPPED", 
                   "Period already correct", filename)
-        return True
+        return True, None
     
-    # Check for duplicate period combination
-    if check_duplicate_period(ops, broker, account, new_period, report_id):
-        # Set period to a unique invalid value to avoid duplicate constraint violation
-        # Use a format that's clearly invalid: 9999-MM (where MM is the original month)
-        unique_invalid_period = f"9999-{new_period.split('-')[1]}"
-        
-        try:
-            update_query = """
-                UPDATE broker_reports 
-                SET period = %s, updated_at = NOW() 
-                WHERE id = %s
-            """
-            
-            with ops.db.get_cursor() as cursor:
-                cursor.execute(update_query, (unique_invalid_period, report_id))
-                ops.db.connection.commit()
-                
-                if cursor.rowcount > 0:
-                    log_change(log_file, report_id, old_period, unique_invalid_period, 
-                              f"Period {new_period} already exists for {broker}/{account}, set to {unique_invalid_period}", filename)
-                    return True
-                else:
-                    log_change(log_file, report_id, old_period, "FAILED", 
-                              "No rows updated when setting to unique invalid period", filename)
-                    return False
-                    
-        except Exception as e:
-            log_change(log_file, report_id, old_period, "ERROR", 
-                      f"Database error when setting to unique invalid period: {str(e)}", filename)
-            return False
+    if claimed.get((broker, account, new_period), report_id) == report_id:
+        claimed[(broker, account, new_period)] = report_id
+        log_change(log_file, report_id, old_period, new_period, 
+                  "Period corrected from period_start", filename)
+        return True, new_period
     
-    # Update the record
-    try:
-        update_query = """
-            UPDATE broker_reports 
-            SET period = %s, updated_at = NOW() 
-            WHERE id = %s
-        """
-        
-        with ops.db.get_cursor() as cursor:
-            cursor.execute(update_query, (new_period, report_id))
-            ops.db.connection.commit()
-            
-            if cursor.rowcount > 0:
-                log_change(log_file, report_id, old_period, new_period, 
-                          "Period corrected from period_start", filename)
-                return True
-            else:
-                log_change(log_file, report_id, old_period, "FAILED", 
-                          "No rows updated", filename)
-                return False
-                
-    except Exception as e:
-        log_change(log_file, report_id, old_period, "ERROR", 
-                  f"Database error: {str(e)}", filename)
-        return False
+    # Period already taken (in the database or earlier in this batch): park the
+    # record on a clearly invalid sentinel 9999-MM, 9998-MM, ... keeping the month
+    month = new_period.split('-')[1]
+    for year in range(SENTINEL_YEAR_MAX, SENTINEL_YEAR_MIN - 1, -1):
+        sentinel_period = f"{year}-{month}"
+        if claimed.get((broker, account, sentinel_period), report_id) != report_id:
+            continue
+        claimed[(broker, account, sentinel_period)] = report_id
+        if sentinel_period == old_period:
+            log_change(log_file, report_id, old_period, "SKIPPED", 
+                      f"Period {new_period} already exists for {broker}/{account}, keeping {old_period}", filename)
+            return True, None
+        log_change(log_file, report_id, old_period, sentinel_period, 
+                  f"Period {new_period} already exists for {broker}/{account}, set to {sentinel_period}", filename)
+        return True, sentinel_period
+    
+    log_change(log_file, report_id, old_period, "FAILED", 
+              f"No free sentinel period left for {broker}/{account}/{month}", filename)
+    return False, None
+
+
+def apply_period_fixes(cursor, fixes: List[Tuple[int, str]]) -> None:
+    """Apply (id, period) pairs via COPY into a temp table and a single joined UPDATE (no commit)"""
+    if not fixes:
+        return
+    
+    # Temp tables are not WAL-logged and this one is dropped with the transaction
+    cursor.execute("""
+        CREATE TEMP TABLE tmp_period_fix (id INTEGER PRIMARY KEY, period CHAR(7) NOT NULL)
+        ON COMMIT DROP
+    """)
+    buffer = io.StringIO("".join(f"{report_id},{period}\n" for report_id, period in fixes))
+    cursor.copy_expert("COPY tmp_period_fix (id, period) FROM STDIN WITH (FORMAT csv)", buffer)
+    cursor.execute("""
+        UPDATE broker_reports b
+        SET period = t.period, updated_at = NOW()
+        FROM tmp_period_fix t
+        WHERE b.id = t.id
+    """)
 
 
 def verify_fixes(ops: BrokerReportOperations) -> Dict[str, int]:
     """Verify that all periods are now within valid range"""
-    # Count remaining invalid periods (excluding special 9999- periods used for duplicates)
-    invalid_query = """
+    # Count remaining invalid periods (excluding sentinel periods used for duplicates)
+    invalid_query = f"""
         SELECT COUNT(*) as count
         FROM broker_reports 
         WHERE (period < '2000-01' OR period > '2025-12')
-        AND period NOT LIKE '9999-%'
+        AND period < '{SENTINEL_YEAR_MIN}-01'
         AND parser_version IS NOT NULL
     """
     
@@ -237,29 +226,40 @@ def main():
     
     print(f"Found {len(invalid_records)} records with invalid periods:")
     
+    for record in invalid_records:
+        print(f"  ID {record['id']}: {record['period']} -> {record['extracted_period']} ({record['file_name']})")
+    
+    if args.dry_run:
+        print(f"\nDRY RUN: Would fix {len(invalid_records)} records")
+        return 0
+    
     fixed_count = 0
     failed_count = 0
+    fixes = []
+    
+    # One lookup of taken periods replaces a duplicate check per record
+    candidate_periods = sorted({r['extracted_period'] for r in invalid_records if r['extracted_period']})
+    claimed = find_claimed_periods(ops, candidate_periods)
     
     for record in invalid_records:
-        report_id = record['id']
-        old_period = record['period']
-        period_start = record['period_start']
-        filename = record['file_name']
-        
-        print(f"  ID {report_id}: {old_period} -> {extract_period_from_date(period_start)} ({filename})")
-        
-        if args.dry_run:
-            continue
-        
-        # Fix the record
-        if fix_record_period(ops, record, log_file):
+        success, period = plan_record_fix(record, claimed, log_file)
+        if success:
             fixed_count += 1
         else:
             failed_count += 1
+        if period:
+            fixes.append((record['id'], period))
     
-    if args.dry_run:
-        print(f"\nDRY RUN: Would fix {len(invalid_records)} records")
-        return 0
+    # All updates share one transaction and are committed once at the end
+    try:
+        with ops.db.get_cursor() as cursor:
+            apply_period_fixes(cursor, fixes)
+        ops.db.connection.commit()
+    except Exception as e:
+        # get_cursor() has already rolled the transaction back
+        log_change(log_file, 0, "-", "ROLLBACK", f"Database error, batch rolled back: {str(e)}", "-")
+        print(f"\nERROR: Database error, no periods were changed: {e}")
+        return 1
     
     # Verify fixes
     print(f"\nFixing completed:")
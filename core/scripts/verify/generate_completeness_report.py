@@ -7,7 +7,7 @@ import sys
 import json
 from pathlib import Path
 from datetime import datetime
-from typing import Dict, List, Any
+from typing import Dict, List, Any, Tuple
 
 # Add project root to Python path
 project_root = Path(__file__).parent.parent.parent.parent
@@ -15,6 +15,26 @@ sys.path.insert(0, str(project_root))
 
 from core.database.operations import BrokerReportOperations
 
+# Latest sber reports analyzed (the sample list_reports() returned by default)
+COVERAGE_SAMPLE_SIZE = 100
+
+# Per-report field presence is computed in the database, so parsed_data itself
+# never leaves it; a key holding JSON null is reported separately from a value
+FIELD_PRESENCE_QUERY = """
+    SELECT id, account, period, file_name,
+           parsed_data IS NOT NULL AND parsed_data <> '{}'::jsonb AS has_parsed_data,
+           CASE WHEN parsed_data ? 'parser_version'
+                THEN parsed_data->>'parser_version' ELSE 'unknown' END AS parser_version,
+           ARRAY(SELECT f FROM unnest(%(fields)s::text[]) AS f
+                 WHERE parsed_data ? f) AS present_fields,
+           ARRAY(SELECT f FROM unnest(%(fields)s::text[]) AS f
+                 WHERE parsed_data -> f = 'null'::jsonb) AS null_fields
+    FROM broker_reports
+    WHERE broker = 'sber'
+    ORDER BY created_at DESC
+    LIMIT %(limit)s
+"""
+
 def load_field_inventory() -> Dict[str, List[str]]:
     """Load field inventory from diagnostics"""
     field_inventory_path = project_root / 'diagnostics' / 'field_inventory.json'
@@ -22,10 +42,7 @@ def load_field_inventory() -> Dict[str, List[str]]:
         return json.load(f)
 
 def analyze_field_coverage(ops: BrokerReportOperations) -> Dict[str, Any]:
-    """Analyze field coverage across all reports"""
-    # Get all Sberbank reports
-    reports = ops.list_reports(broker='sber')
-    
+    """Analyze field coverage across the latest COVERAGE_SAMPLE_SIZE sber reports"""
     # Load field inventory
     field_inventory = load_field_inventory()
     all_fields = []
@@ -33,55 +50,47 @@ def analyze_field_coverage(ops: BrokerReportOperations) -> Dict[str, Any]:
         if isinstance(fields, list):
             all_fields.extend(fields)
     
+    # One query returns each sampled report's present and null fields
+    rows = ops.execute_raw_query(FIELD_PRESENCE_QUERY,
+                                 {'fields': all_fields, 'limit': COVERAGE_SAMPLE_SIZE})
+    total_reports = len(rows)
+    
     # Initialize field statistics
-    field_stats = {}
-    for field in all_fields:
-        field_stats[field] = {
-            'present': 0,
-            'null': 0,
-            'missing': 0,
-            'invalid': 0
-        }
+    field_stats = {field: {'present': 0, 'null': 0, 'missing': 0, 'invalid': 0} for field in all_fields}
     
     report_results = []
-    total_reports = len(reports)
+    total_fields = len(all_fields)
     
-    for report in reports:
-        full_report = ops.get_report(report['id'])
-        if not full_report or not full_report.get('parsed_data'):
+    for row in rows:
+        if not row['has_parsed_data']:
             continue
         
-        parsed_data = full_report['parsed_data']
+        present_fields = set(row['present_fields'])
+        null_fields = set(row['null_fields'])
         report_result = {
-            'report_id': report['id'],
-            'account': report.get('account', ''),
-            'period': report.get('period', ''),
-            'file_name': report.get('file_name', ''),
+            'report_id': row['id'],
+            'account': row.get('account', ''),
+            'period': row.get('period', ''),
+            'file_name': row.get('file_name', ''),
             'completeness_percent': 0,
             'missing_fields': [],
             'invalid_fields': [],
             'present_fields': [],
-            'parser_version': parsed_data.get('parser_version', 'unknown')
+            'parser_version': row['parser_version']
         }
         
-        # Analyze each field
+        # Tally each field in inventory order
         for field in all_fields:
-            if field in parsed_data:
-                value = parsed_data[field]
-                if value is None:
-                    field_stats[field]['null'] += 1
-                    # Count null as present (parser tried to extract it)
-                    report_result['present_fields'].append(field)
-                else:
-                    field_stats[field]['present'] += 1
-                    report_result['present_fields'].append(field)
+            if field in present_fields:
+                # Count null as present (parser tried to extract it)
+                field_stats[field]['null' if field in null_fields else 'present'] += 1
+                report_result['present_fields'].append(field)
             else:
                 field_stats[field]['missing'] += 1
                 report_result['missing_fields'].append(field)
         
         # Calculate completeness percentage
         present_count = len(report_result['present_fields'])
-        total_fields = len(all_fields)
         report_result['completeness_percent'] = (present_count / total_fields * 100) if total_fields > 0 else 0
         
         report_results.append(report_result)
@@ -105,6 +114,34 @@ def analyze_field_coverage(ops: BrokerReportOperations) -> Dict[str, Any]:
         'field_inventory': field_inventory
     }
 
+# Coverage thresholds in descending order: (min_percent, status, recommendation)
+COVERAGE_LEVELS = (
+    (90, "✅ Excellent", "Maintain current extraction"),
+    (70, "🟡 Good", "Review extraction logic"),
+    (50, "🟠 Fair", "Improve extraction"),
+)
+COVERAGE_FALLBACK = ("❌ Poor", "Implement extraction")
+
+def classify_coverage(coverage_pct: float) -> Tuple[str, str]:
+    """Return (status, recommendation) for a field coverage percentage"""
+    for threshold, status, recommendation in COVERAGE_LEVELS:
+        if coverage_pct >= threshold:
+            return status, recommendation
+    return COVERAGE_FALLBACK
+
+def compute_field_coverage(field_stats: Dict[str, Dict[str, int]], total_reports: int) -> Dict[str, list]:
+    """Compute per-field coverage in one pass as parallel columns (field, present, percent, status)"""
+    fields = list(field_stats)
+    total_present = [stats['present'] + stats['null'] for stats in field_stats.values()]
+    scale = 100 / total_reports if total_reports > 0 else 0
+    coverage_pct = [present * scale for present in total_present]
+    return {
+        'fields': fields,
+        'total_present': total_present,
+        'coverage_pct': coverage_pct,
+        'status': [classify_coverage(pct) for pct in coverage_pct],
+    }
+
 def generate_markdown_report(analysis: Dict[str, Any]) -> str:
     """Generate markdown report"""
     report = []
@@ -123,13 +160,11 @@ def generate_markdown_report(analysis: Dict[str, Any]) -> str:
     report.append(f"- **Average Report Completeness:** {analysis['avg_report_completeness_percent']:.1f}% ({analysis['total_fields_analyzed']} fields analyzed)")
     report.append(f"- **Total Reports:** {analysis['total_reports']}")
     
+    # Per-field coverage is computed once and shared by both sections below
+    coverage = compute_field_coverage(analysis['field_stats'], analysis['total_reports'])
+    
     # Count high-coverage fields
-    high_coverage_fields = 0
-    for field, stats in analysis['field_stats'].items():
-        total_present = stats['present'] + stats['null']
-        coverage_pct = (total_present / analysis['total_reports'] * 100) if analysis['total_reports'] > 0 else 0
-        if coverage_pct >= 80:
-            high_coverage_fields += 1
+    high_coverage_fields = sum(1 for pct in coverage['coverage_pct'] if pct >= 80)
     
     report.append(f"- **High Coverage Fields:** {high_coverage_fields}/{analysis['total_fields_analyzed']} fields ≥80% coverage")
     report.append("")
@@ -173,23 +208,9 @@ def generate_markdown_report(analysis: Dict[str, Any]) -> str:
     report.append("| Field Name | Present in Reports | Completeness % | Status | Recommendation |")
     report.append("|------------|-------------------|----------------|--------|----------------|")
     
-    for field, stats in analysis['field_stats'].items():
-        total_present = stats['present'] + stats['null']
-        coverage_pct = (total_present / analysis['total_reports'] * 100) if analysis['total_reports'] > 0 else 0
-        
-        if coverage_pct >= 90:
-            status = "✅ Excellent"
-            recommendation = "Maintain current extraction"
-        elif coverage_pct >= 70:
-            status = "🟡 Good"
-            recommendation = "Review extraction logic"
-        elif coverage_pct >= 50:
-            status = "🟠 Fair"
-            recommendation = "Improve extraction"
-        else:
-            status = "❌ Poor"
-            recommendation = "Implement extraction"
-        
+    for field, total_present, coverage_pct, (status, recommendation) in zip(
+        coverage['fields'], coverage['total_present'], coverage['coverage_pct'], coverage['status']
+    ):
         report.append(f"| {field} | {total_present}/{analysis['total_reports']} | {coverage_pct:.1f}% | {status} | {recommendation} |")
     
     report.append("")
@@ -6,13 +6,17 @@ Comprehensive validation of database consistency, parsed data structure, CLI com
 
 import sys
 import os
-import subprocess
+import io
+import contextlib
+import importlib
 import json
 import shutil
 from pathlib import Path
 from datetime import datetime
-from typing import Dict, List, Any, Tuple
+from typing import Dict, List, Any, Optional, Tuple
 import logging
+import time
+from collections import defaultdict, namedtuple
 
 # Add project root to Python path
 project_root = Path(__file__).parent.parent.parent.parent
@@ -20,13 +24,73 @@ sys.path.insert(0, str(project_root))
 
 from core.database.operations import BrokerReportOperations
 from core.config import Config
-from core.parsers import get_parser, list_supported_brokers, is_broker_supported
+from core.parsers import get_parser, list_supported_brokers
+from core.scripts.query import query_reports
 from rich.console import Console
 
 # Setup logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# One logged check outcome; timestamp is epoch seconds from time.time()
+SmokeResult = namedtuple('SmokeResult', 'section check status details timestamp')
+
+# Buffer size for streaming the stability-test file into the inbox
+COPY_BUFFER_SIZE = 1024 * 1024
+
+# Fields every parsed report must contain
+REQUIRED_PARSED_FIELDS = frozenset([
+    'balance_ending', 'account_open_date', 'trade_count', 'instruments', 'financial_result'
+])
+
+# A field is "high coverage" when present in at least this share of reports
+HIGH_COVERAGE_PERCENT = 80
+
+# Distribution bucket for records with NULL or empty broker
+NULL_BROKER_BUCKET = '__null__'
+
+def _scan_html_files(directory: Path, first_only: bool = False) -> Tuple[int, Optional[Path]]:
+    """Count *.html files in directory with os.scandir; return (count, first_match)"""
+    count = 0
+    first = None
+    with os.scandir(directory) as entries:
+        for entry in entries:
+            if entry.name.endswith('.html') and entry.is_file(follow_symlinks=False):
+                count += 1
+                if first is None:
+                    first = Path(entry.path)
+                    if first_only:
+                        break
+    return count, first
+
+def _run_script_main(module_name: str, argv: List[str]) -> Tuple[bool, str]:
+    """Run a CLI script's main(argv) in-process; return (success, captured_output)
+    
+    The import and parse scripts signal success with a truthy result or exit
+    code 0 respectively, so both conventions are accepted here.
+    """
+    buffer = io.StringIO()
+    try:
+        # importlib is needed because 'import' in core.scripts.import is a keyword
+        module = importlib.import_module(module_name)
+        with contextlib.redirect_stdout(buffer), contextlib.redirect_stderr(buffer):
+            result = module.main(argv)
+    except SystemExit as e:
+        result = e.code in (0, None)
+    except Exception as e:
+        return False, f"{buffer.getvalue()}{e}"
+    success = result == 0 if isinstance(result, int) and not isinstance(result, bool) else bool(result)
+    return success, buffer.getvalue()
+
+def _is_non_negative_number(value) -> bool:
+    """True if value parses as a float that is >= 0"""
+    if value is None:
+        return False
+    try:
+        return float(value) >= 0
+    except (ValueError, TypeError):
+        return False
+
 class SmokeTestValidator:
     """Comprehensive smoke test validator for BrokerCursor system"""
     
@@ -34,21 +98,27 @@ class SmokeTestValidator:
         self.console = Console()
         self.config = Config()
         self.ops = BrokerReportOperations()
-        self.results = []
+        self.results_by_section = defaultdict(list)
         self.passed_checks = 0
         self.failed_checks = 0
         self.test_file_path = None
+        self.test_record_id = None
+        
+        # Resolve the parser registry once; instantiation errors are kept and
+        # reported by check_broker_distribution
+        self.supported_brokers = list_supported_brokers()
+        self.supported = frozenset(self.supported_brokers)
+        self.parsers = {}
+        for broker in self.supported_brokers:
+            try:
+                self.parsers[broker] = get_parser(broker)
+            except Exception as e:
+                self.parsers[broker] = e
         
     def log_result(self, section: str, check: str, status: str, details: str = ""):
         """Log validation result"""
-        result = {
-            'section': section,
-            'check': check,
-            'status': status,
-            'details': details,
-            'timestamp': datetime.now().isoformat()
-        }
-        self.results.append(result)
+        # Raw epoch seconds; formatting is left to whoever needs a readable timestamp
+        self.results_by_section[section].append(SmokeResult(section, check, status, details, time.time()))
         
         if status == "PASS":
             self.passed_checks += 1
@@ -66,8 +136,13 @@ class SmokeTestValidator:
     def check_db_consistency(self):
         """1. Check database consistency - record count vs files"""
         try:
-            # Count records in database
-            db_records = self.ops.count_reports()
+            # Count records, hashes, parsed statuses and parsed_data in one scan
+            stats = self.ops.count_consistency_stats()
+            if not stats:
+                self.log_result("DB Consistency", "Database consistency check", "FAIL",
+                              "Failed to read report counters")
+                return
+            db_records = stats['total']
             
             # Count files in archive
             archive_path = self.config.ARCHIVE_PATH
@@ -76,8 +151,7 @@ class SmokeTestValidator:
                               f"Archive path not found: {archive_path}")
                 return
             
-            html_files = list(archive_path.glob("*.html"))
-            file_count = len(html_files)
+            file_count, _ = _scan_html_files(archive_path)
             
             if db_records == file_count:
                 self.log_result("DB Consistency", "Record count matches file count", "PASS",
@@ -87,7 +161,7 @@ class SmokeTestValidator:
                               f"DB records: {db_records}, Archive files: {file_count}")
             
             # Check all records have file_hash
-            records_with_hash = self.ops.count_reports_with_hash()
+            records_with_hash = stats['with_hash']
             if records_with_hash == db_records:
                 self.log_result("DB Consistency", "All records have file_hash", "PASS",
                               f"Records with hash: {records_with_hash}/{db_records}")
@@ -96,7 +170,7 @@ class SmokeTestValidator:
                               f"Records with hash: {records_with_hash}/{db_records}")
             
             # Check all records are parsed
-            parsed_records = self.ops.count_reports_by_status('parsed')
+            parsed_records = stats['parsed']
             if parsed_records == db_records:
                 self.log_result("DB Consistency", "All records are parsed", "PASS",
                               f"Parsed records: {parsed_records}/{db_records}")
@@ -105,7 +179,7 @@ class SmokeTestValidator:
                               f"Parsed records: {parsed_records}/{db_records}")
             
             # Check all records have parsed_data
-            records_with_data = self.ops.count_reports_with_parsed_data()
+            records_with_data = stats['with_parsed_data']
             if records_with_data == db_records:
                 self.log_result("DB Consistency", "All records have parsed_data", "PASS",
                               f"Records with parsed_data: {records_with_data}/{db_records}")
@@ -119,47 +193,63 @@ class SmokeTestValidator:
     def check_parsed_data_structure(self):
         """2. Validate parsed_data structure and required fields"""
         try:
-            # Get sample of reports with parsed_data
-            reports = self.ops.list_reports(limit=5)
+            # Project only what is validated: balance, instruments shape and missing required keys
+            query = """
+                SELECT id,
+                       parsed_data->'balance_ending' AS balance,
+                       jsonb_typeof(parsed_data->'instruments') AS instruments_type,
+                       CASE WHEN jsonb_typeof(parsed_data->'instruments') = 'array'
+                            THEN jsonb_array_length(parsed_data->'instruments')
+                       END AS instruments_count,
+                       ARRAY(SELECT f FROM unnest(%s::text[]) AS f
+                             WHERE NOT parsed_data ? f ORDER BY f) AS missing_fields
+                FROM broker_reports
+                WHERE parsed_data IS NOT NULL
+                ORDER BY created_at DESC
+                LIMIT 5
+            """
+            reports = self.ops.execute_raw_query(query, (sorted(REQUIRED_PARSED_FIELDS),))
             if not reports:
                 self.log_result("Parsed Data", "Sample reports available", "FAIL", "No reports found")
                 return
             
-            required_fields = ['balance_ending', 'account_open_date', 'trade_count', 'instruments', 'financial_result']
             valid_structure_count = 0
+            invalid_balances = []
+            invalid_instruments = []
+            missing_by_report = []
             
+            # Collect per-report outcomes and log one aggregated result per check
             for report in reports:
-                full_report = self.ops.get_report(report['id'])
-                if not full_report or not full_report.get('parsed_data'):
+                missing_fields = report['missing_fields']
+                if missing_fields:
+                    missing_by_report.append(f"{report['id']}: {missing_fields}")
                     continue
                 
-                parsed_data = full_report['parsed_data']
-                has_all_fields = all(field in parsed_data for field in required_fields)
+                valid_structure_count += 1
                 
-                if has_all_fields:
-                    valid_structure_count += 1
-                    
-                    # Check for reasonable values
-                    balance = parsed_data.get('balance_ending', 0)
-                    if isinstance(balance, (int, float)) and balance >= 0:
-                        self.log_result("Parsed Data", f"Report {report['id']} has valid balance", "PASS",
-                                      f"Balance: {balance}")
-                    else:
-                        self.log_result("Parsed Data", f"Report {report['id']} balance validation", "FAIL",
-                                      f"Invalid balance: {balance}")
-                    
-                    # Check instruments structure
-                    instruments = parsed_data.get('instruments', [])
-                    if isinstance(instruments, list):
-                        self.log_result("Parsed Data", f"Report {report['id']} instruments structure", "PASS",
-                                      f"Instruments count: {len(instruments)}")
-                    else:
-                        self.log_result("Parsed Data", f"Report {report['id']} instruments structure", "FAIL",
-                                      f"Invalid instruments type: {type(instruments)}")
-                else:
-                    missing_fields = [f for f in required_fields if f not in parsed_data]
-                    self.log_result("Parsed Data", f"Report {report['id']} missing fields", "FAIL",
-                                  f"Missing: {missing_fields}")
+                # Check for reasonable values
+                balance = report['balance']
+                if not (isinstance(balance, (int, float)) and balance >= 0):
+                    invalid_balances.append(f"{report['id']}: {balance}")
+                
+                # Check instruments structure
+                if report['instruments_type'] != 'array':
+                    invalid_instruments.append(f"{report['id']}: {report['instruments_type']}")
+            
+            if valid_structure_count > 0:
+                details = f"Valid balances: {valid_structure_count - len(invalid_balances)}/{valid_structure_count}"
+                if invalid_balances:
+                    details += f"; invalid: {', '.join(invalid_balances)}"
+                self.log_result("Parsed Data", "Balance validation", "FAIL" if invalid_balances else "PASS", details)
+                
+                details = f"Valid instruments lists: {valid_structure_count - len(invalid_instruments)}/{valid_structure_count}"
+                if invalid_instruments:
+                    details += f"; invalid types: {', '.join(invalid_instruments)}"
+                self.log_result("Parsed Data", "Instruments structure", "FAIL" if invalid_instruments else "PASS", details)
+            
+            if missing_by_report:
+                self.log_result("Parsed Data", "Required fields present", "FAIL",
+                              f"Missing by report: {'; '.join(missing_by_report)}")
             
             if valid_structure_count > 0:
                 self.log_result("Parsed Data", "Valid structure reports found", "PASS",
@@ -183,46 +273,22 @@ class SmokeTestValidator:
             with open(field_inventory_path, 'r', encoding='utf-8') as f:
                 field_inventory = json.load(f)
             
-            # Get all expected fields
-            expected_fields = []
-            for category, fields in field_inventory.items():
-                if isinstance(fields, list):
-                    expected_fields.extend(fields)
-            
-            # Get Sberbank reports
-            reports = self.ops.list_reports(broker='sber', limit=20)
-            if not reports:
+            # Get all expected fields (a field listed in several categories counts once)
+            expected_fields = frozenset(
+                field
+                for fields in field_inventory.values() if isinstance(fields, list)
+                for field in fields
+            )
+            
+            # Aggregate field presence for the latest Sberbank reports server-side
+            coverage = self.ops.get_field_coverage(sorted(expected_fields), broker='sber', limit=20,
+                                                   parser_version='2.0')
+            if not coverage.get('total_reports'):
                 self.log_result("Parser Coverage", "Sberbank reports available", "FAIL", "No Sberbank reports found")
                 return
             
-            total_reports = len(reports)
-            field_coverage = {}
-            parser_version_2_count = 0
-            
-            # Analyze each report
-            for report in reports:
-                full_report = self.ops.get_report(report['id'])
-                if not full_report or not full_report.get('parsed_data'):
-                    continue
-                
-                parsed_data = full_report['parsed_data']
-                
-                # Check parser version
-                if parsed_data.get('parser_version') == '2.0':
-                    parser_version_2_count += 1
-                
-                # Count field presence
-                for field in expected_fields:
-                    if field not in field_coverage:
-                        field_coverage[field] = {'present': 0, 'null': 0, 'missing': 0}
-                    
-                    if field in parsed_data:
-                        if parsed_data[field] is None:
-                            field_coverage[field]['null'] += 1
-                        else:
-                            field_coverage[field]['present'] += 1
-                    else:
-                        field_coverage[field]['missing'] += 1
+            total_reports = coverage['total_reports']
+            parser_version_2_count = coverage['parser_version_count']
             
             # Check parser version coverage
             parser_version_coverage = (parser_version_2_count / total_reports * 100) if total_reports > 0 else 0
@@ -233,16 +299,14 @@ class SmokeTestValidator:
                 self.log_result("Parser Coverage", "Parser version 2.0", "FAIL", 
                               f"v2.0 coverage: {parser_version_coverage:.1f}% ({parser_version_2_count}/{total_reports})")
             
-            # Check field coverage
-            high_coverage_fields = 0
+            # Check field coverage: a field is high-coverage when present in ≥80% of reports.
+            # Compare counts against the precomputed threshold instead of a percentage per field.
             total_fields = len(expected_fields)
-            
-            for field, stats in field_coverage.items():
-                total_present = stats['present'] + stats['null']
-                coverage_pct = (total_present / total_reports * 100) if total_reports > 0 else 0
-                
-                if coverage_pct >= 80:  # Field present in ≥80% of reports
-                    high_coverage_fields += 1
+            min_present = HIGH_COVERAGE_PERCENT * total_reports
+            high_coverage_fields = sum(
+                1 for total_present in coverage['field_present'].values()
+                if total_present * 100 >= min_present
+            )
             
             field_coverage_pct = (high_coverage_fields / total_fields * 100) if total_fields > 0 else 0
             
@@ -263,41 +327,33 @@ class SmokeTestValidator:
     def check_cli_commands(self):
         """3. Test CLI commands functionality"""
         try:
+            # Run the query CLI in-process: one interpreter and DB connection for all commands
             # Test --show balance_ending
-            result = subprocess.run([
-                sys.executable, 'core/scripts/query/query_reports.py', 
-                '--show', 'balance_ending', '--limit', '1'
-            ], capture_output=True, text=True, cwd=project_root)
+            code, output = query_reports.run(['--show', 'balance_ending', '--limit', '1'])
             
-            if result.returncode == 0 and 'Balance Ending:' in result.stdout:
+            if code == 0 and 'Balance Ending:' in output:
                 self.log_result("CLI Commands", "--show balance_ending", "PASS", "Command executed successfully")
             else:
                 self.log_result("CLI Commands", "--show balance_ending", "FAIL", 
-                              f"Return code: {result.returncode}, Error: {result.stderr}")
+                              f"Return code: {code}, Output: {output.strip()}")
             
             # Test --filter period=2023-05
-            result = subprocess.run([
-                sys.executable, 'core/scripts/query/query_reports.py',
-                '--filter', 'period=2023-05', '--limit', '5'
-            ], capture_output=True, text=True, cwd=project_root)
+            code, output = query_reports.run(['--filter', 'period=2023-05', '--limit', '5'])
             
-            if result.returncode == 0:
+            if code == 0:
                 self.log_result("CLI Commands", "--filter period=2023-05", "PASS", "Filter command executed")
             else:
                 self.log_result("CLI Commands", "--filter period=2023-05", "FAIL",
-                              f"Return code: {result.returncode}, Error: {result.stderr}")
+                              f"Return code: {code}, Output: {output.strip()}")
             
             # Test --search account=S000T49
-            result = subprocess.run([
-                sys.executable, 'core/scripts/query/query_reports.py',
-                '--search', 'account=S000T49', '--limit', '5'
-            ], capture_output=True, text=True, cwd=project_root)
+            code, output = query_reports.run(['--search', 'account=S000T49', '--limit', '5'])
             
-            if result.returncode == 0:
+            if code == 0:
                 self.log_result("CLI Commands", "--search account=S000T49", "PASS", "Search command executed")
             else:
                 self.log_result("CLI Commands", "--search account=S000T49", "FAIL",
-                              f"Return code: {result.returncode}, Error: {result.stderr}")
+                              f"Return code: {code}, Output: {output.strip()}")
                 
         except Exception as e:
             self.log_result("CLI Commands", "CLI command testing", "FAIL", str(e))
@@ -320,16 +376,21 @@ class SmokeTestValidator:
                 'import_result.md'
             ]
             
+            # List the diagnostics directory once instead of stat-ing each expected file
+            try:
+                with os.scandir(diagnostics_path) as entries:
+                    diagnostic_files = {entry.name for entry in entries if entry.is_file()}
+            except FileNotFoundError:
+                diagnostic_files = set()
+            
             for report_file in required_reports:
-                report_path = diagnostics_path / report_file
-                if report_path.exists():
+                if report_file in diagnostic_files:
                     self.log_result("Audit Logs", f"Diagnostic report {report_file}", "PASS", "Report exists")
                 else:
                     self.log_result("Audit Logs", f"Diagnostic report {report_file}", "FAIL", "Report missing")
             
             # Check removed_duplicates.log
-            duplicates_log = diagnostics_path / 'removed_duplicates.log'
-            if duplicates_log.exists():
+            if 'removed_duplicates.log' in diagnostic_files:
                 self.log_result("Audit Logs", "Duplicates log exists", "PASS", "Duplicates log found")
             else:
                 self.log_result("Audit Logs", "Duplicates log exists", "FAIL", "Duplicates log missing")
@@ -342,76 +403,65 @@ class SmokeTestValidator:
         try:
             # Find a file in archive to copy
             archive_path = self.config.ARCHIVE_PATH
-            html_files = list(archive_path.glob("*.html"))
+            _, source_file = _scan_html_files(archive_path, first_only=True)
             
-            if not html_files:
+            if source_file is None:
                 self.log_result("New Data Stability", "Archive files available", "FAIL", "No HTML files in archive")
                 return
             
-            # Create tmp directory for test files
-            tmp_dir = self.config.INBOX_PATH.parent / 'tmp'
-            tmp_dir.mkdir(parents=True, exist_ok=True)
-            
-            # Copy to tmp and modify to avoid duplicate hash
-            source_file = html_files[0]
-            test_filename = f"smoke_test_{datetime.now().strftime('%Y%m%d_%H%M%S')}.html"
-            self.test_file_path = tmp_dir / test_filename
-            shutil.copy2(source_file, self.test_file_path)
-            
-            # Add unique marker to avoid duplicate hash
-            with open(self.test_file_path, 'a', encoding='utf-8') as f:
-                f.write(f"\n<!-- smoke test marker: {datetime.now().isoformat()} -->")
-            
-            # Move to inbox for processing
+            # Stream the archive file straight into the inbox and append a unique
+            # marker so its hash does not match the original
             inbox_path = self.config.INBOX_PATH
             inbox_path.mkdir(parents=True, exist_ok=True)
-            inbox_test_path = inbox_path / test_filename
-            shutil.move(self.test_file_path, inbox_test_path)
-            self.test_file_path = inbox_test_path
+            test_filename = f"smoke_test_{datetime.now().strftime('%Y%m%d_%H%M%S')}.html"
+            self.test_file_path = inbox_path / test_filename
+            with open(source_file, 'rb') as src, open(self.test_file_path, 'wb') as dst:
+                shutil.copyfileobj(src, dst, COPY_BUFFER_SIZE)
+                dst.write(f"\n<!-- smoke test marker: {datetime.now().isoformat()} -->".encode('utf-8'))
             
             self.log_result("New Data Stability", "Test file copied to inbox", "PASS",
                           f"Copied: {source_file.name} -> {test_filename}")
             
-            # Run import
-            result = subprocess.run([
-                sys.executable, 'core/scripts/import/import_reports.py'
-            ], capture_output=True, text=True, cwd=project_root)
+            # Run import and parsing in-process: no extra interpreter start-up or DB connection
+            success, output = _run_script_main('core.scripts.import.import_reports', [])
             
-            if result.returncode == 0:
+            if success:
                 self.log_result("New Data Stability", "Import process", "PASS", "Import completed successfully")
             else:
                 self.log_result("New Data Stability", "Import process", "FAIL",
-                              f"Import failed: {result.stderr}")
+                              f"Import failed: {output}")
                 return
             
-            # Run parsing
-            result = subprocess.run([
-                sys.executable, 'core/scripts/parse/parse_reports.py'
-            ], capture_output=True, text=True, cwd=project_root)
+            success, output = _run_script_main('core.scripts.parse.parse_reports', [])
             
-            if result.returncode == 0:
+            if success:
                 self.log_result("New Data Stability", "Parse process", "PASS", "Parsing completed successfully")
             else:
                 self.log_result("New Data Stability", "Parse process", "FAIL",
-                              f"Parsing failed: {result.stderr}")
+                              f"Parsing failed: {output}")
+            
+            # Stat both locations once; the checks below share the answers
+            archived = (archive_path / test_filename).exists()
+            still_in_inbox = self.test_file_path.exists()
             
             # Verify file moved to archive
-            if (archive_path / test_filename).exists():
+            if archived:
                 self.log_result("New Data Stability", "File moved to archive", "PASS", "Test file archived")
             else:
                 # Check if file was rejected as duplicate (expected behavior)
-                if self.test_file_path.exists():
+                if still_in_inbox:
                     self.log_result("New Data Stability", "File moved to archive", "SKIP", "Test file rejected as duplicate (expected behavior)")
                 else:
                     self.log_result("New Data Stability", "File moved to archive", "FAIL", "Test file not found in archive")
             
             # Verify database record created
             test_record = self.ops.get_report_by_filename(test_filename)
+            self.test_record_id = test_record['id'] if test_record else None
             if test_record:
                 self.log_result("New Data Stability", "Database record created", "PASS", f"Record ID: {test_record['id']}")
             else:
                 # Check if this is expected behavior (duplicate rejection)
-                if not (archive_path / test_filename).exists() and self.test_file_path.exists():
+                if not archived and still_in_inbox:
                     self.log_result("New Data Stability", "Database record created", "SKIP", "Test file rejected as duplicate (expected behavior)")
                 else:
                     self.log_result("New Data Stability", "Database record created", "FAIL", "No database record found")
@@ -422,11 +472,11 @@ class SmokeTestValidator:
     def check_broker_distribution(self):
         """7. Check broker distribution and parser registry functionality"""
         try:
-            # Get broker distribution from database
-            broker_query = """
-                SELECT broker, COUNT(*) as count 
+            # Get broker distribution from database; NULL/empty brokers share one bucket
+            broker_query = f"""
+                SELECT COALESCE(NULLIF(broker, ''), '{NULL_BROKER_BUCKET}') as broker, COUNT(*) as count 
                 FROM broker_reports 
-                GROUP BY broker 
+                GROUP BY 1 
                 ORDER BY count DESC
             """
             broker_distribution = self.ops.db.execute_query(broker_query)
@@ -437,19 +487,23 @@ class SmokeTestValidator:
             
             total_records = sum(row['count'] for row in broker_distribution)
             unknown_count = 0
+            null_count = 0
             
             # Check each broker
             for row in broker_distribution:
                 broker = row['broker']
                 count = row['count']
                 
-                if broker == 'unknown':
+                if broker == NULL_BROKER_BUCKET:
+                    # Reported by the NULL broker check below
+                    null_count = count
+                elif broker == 'unknown':
                     unknown_count = count
                     self.log_result("Broker Distribution", f"Unknown broker records", "WARN" if count > 0 else "PASS",
                                   f"Unknown broker: {count} records")
                 else:
                     # Check if broker is supported
-                    if is_broker_supported(broker):
+                    if broker in self.supported:
                         self.log_result("Broker Distribution", f"Supported broker {broker}", "PASS",
                                       f"{broker}: {count} records")
                     else:
@@ -466,30 +520,25 @@ class SmokeTestValidator:
                               f"Unknown brokers: {unknown_percentage:.1f}% ({unknown_count}/{total_records})")
             
             # Test parser registry functionality
-            supported_brokers = list_supported_brokers()
             self.log_result("Broker Distribution", "Parser registry", "PASS",
-                          f"Supported brokers: {', '.join(supported_brokers)}")
+                          f"Supported brokers: {', '.join(self.supported_brokers)}")
             
             # Test parser instantiation for each supported broker
-            for broker in supported_brokers:
+            for broker in self.supported_brokers:
+                parser = self.parsers[broker]
+                if isinstance(parser, Exception):
+                    self.log_result("Broker Distribution", f"Parser for {broker}", "FAIL",
+                                  f"Failed to instantiate: {parser}")
+                    continue
                 try:
-                    parser = get_parser(broker)
                     version = parser.get_parser_version()
                     self.log_result("Broker Distribution", f"Parser for {broker}", "PASS",
                                   f"Version: {version}")
                 except Exception as e:
                     self.log_result("Broker Distribution", f"Parser for {broker}", "FAIL",
-                                  f"Failed to instantiate: {e}")
+                                  f"Failed to get parser version: {e}")
             
             # Check for records with NULL broker
-            null_broker_query = """
-                SELECT COUNT(*) as count 
-                FROM broker_reports 
-                WHERE broker IS NULL OR broker = ''
-            """
-            null_result = self.ops.db.execute_query(null_broker_query)
-            null_count = null_result[0]['count'] if null_result else 0
-            
             if null_count == 0:
                 self.log_result("Broker Distribution", "No NULL broker values", "PASS",
                               "All records have valid broker field")
@@ -503,9 +552,10 @@ class SmokeTestValidator:
     def check_manual_sql_query(self):
         """6. Test manual SQL query for JSONB data extraction"""
         try:
-            # Execute SQL query to extract balance_ending
+            # Execute SQL query to extract balance_ending; it is left as text so
+            # one non-numeric value cannot abort the query
             query = """
-                SELECT account, period, (parsed_data->>'balance_ending')::numeric as balance
+                SELECT account, period, parsed_data->>'balance_ending' as balance
                 FROM broker_reports 
                 WHERE parsed_data IS NOT NULL
                 ORDER BY period DESC 
@@ -518,17 +568,8 @@ class SmokeTestValidator:
                 self.log_result("Manual SQL", "JSONB query execution", "PASS",
                               f"Retrieved {len(results)} records with balance data")
                 
-                # Check if balances are reasonable
-                valid_balances = 0
-                for row in results:
-                    balance = row.get('balance')
-                    if balance is not None:
-                        try:
-                            balance_float = float(balance)
-                            if balance_float >= 0:
-                                valid_balances += 1
-                        except (ValueError, TypeError):
-                            pass
+                # Check if balances are reasonable, skipping values that are not numbers
+                valid_balances = sum(1 for row in results if _is_non_negative_number(row['balance']))
                 
                 if valid_balances > 0:
                     self.log_result("Manual SQL", "Balance data validation", "PASS",
@@ -548,12 +589,15 @@ class SmokeTestValidator:
                 self.test_file_path.unlink()
                 self.log_result("Cleanup", "Test file removed", "PASS", "Test file cleaned up")
             
-            # Remove test record from database if it exists
-            if self.test_file_path:
+            # Remove test record from database if the stability check created one;
+            # look it up by name when the check stopped before caching its id
+            if self.test_record_id is None and self.test_file_path:
                 test_record = self.ops.get_report_by_filename(self.test_file_path.name)
-                if test_record:
-                    self.ops.delete_report(test_record['id'])
-                    self.log_result("Cleanup", "Test record removed", "PASS", "Test database record cleaned up")
+                self.test_record_id = test_record['id'] if test_record else None
+            if self.test_record_id:
+                self.ops.delete_report(self.test_record_id)
+                self.test_record_id = None
+                self.log_result("Cleanup", "Test record removed", "PASS", "Test database record cleaned up")
                     
         except Exception as e:
             self.log_result("Cleanup", "Test data cleanup", "FAIL", str(e))
@@ -564,49 +608,48 @@ class SmokeTestValidator:
             report_path = project_root / 'diagnostics' / 'smoke_test_report.md'
             report_path.parent.mkdir(parents=True, exist_ok=True)
             
-            with open(report_path, 'w', encoding='utf-8') as f:
-                f.write(f"# Smoke Test Report\n\n")
-                f.write(f"**Generated:** {datetime.now().isoformat()}\n\n")
-                
-                # Summary
-                total_checks = self.passed_checks + self.failed_checks
-                success_rate = (self.passed_checks / total_checks * 100) if total_checks > 0 else 0
-                
-                f.write(f"## Summary\n\n")
-                f.write(f"- Total Checks: {total_checks}\n")
-                f.write(f"- Passed: {self.passed_checks}\n")
-                f.write(f"- Failed: {self.failed_checks}\n")
-                f.write(f"- Success Rate: {success_rate:.1f}%\n\n")
-                
-                # Overall status
-                overall_status = "PASS" if self.failed_checks == 0 else "FAIL"
-                f.write(f"## Overall Status: {overall_status}\n\n")
-                
-                # Detailed results by section
-                sections = {}
-                for result in self.results:
-                    section = result['section']
-                    if section not in sections:
-                        sections[section] = []
-                    sections[section].append(result)
-                
-                for section, results in sections.items():
-                    f.write(f"## {section}\n\n")
+            # Build the whole report in memory and write it with a single call
+            parts = []
+            append = parts.append
+            append("# Smoke Test Report\n\n")
+            append(f"**Generated:** {datetime.now().isoformat()}\n\n")
+            
+            # Summary
+            total_checks = self.passed_checks + self.failed_checks
+            success_rate = (self.passed_checks / total_checks * 100) if total_checks > 0 else 0
+            
+            append("## Summary\n\n")
+            append(f"- Total Checks: {total_checks}\n")
+            append(f"- Passed: {self.passed_checks}\n")
+            append(f"- Failed: {self.failed_checks}\n")
+            append(f"- Success Rate: {success_rate:.1f}%\n\n")
+            
+            # Overall status
+            overall_status = "PASS" if self.failed_checks == 0 else "FAIL"
+            append(f"## Overall Status: {overall_status}\n\n")
+            
+            # Detailed results by section
+            for section, results in self.results_by_section.items():
+                append(f"## {section}\n\n")
+                for result in results:
+                    status_icon = "✅" if result.status == "PASS" else "❌"
+                    append(f"- {status_icon} **{result.check}**: {result.status}\n")
+                    if result.details:
+                        append(f"  - Details: {result.details}\n")
+                append("\n")
+            
+            # Recommendations
+            if self.failed_checks > 0:
+                append("## Recommendations\n\n")
+                append("The following issues were identified:\n\n")
+                for results in self.results_by_section.values():
                     for result in results:
-                        status_icon = "✅" if result['status'] == "PASS" else "❌"
-                        f.write(f"- {status_icon} **{result['check']}**: {result['status']}\n")
-                        if result['details']:
-                            f.write(f"  - Details: {result['details']}\n")
-                    f.write("\n")
-                
-                # Recommendations
-                if self.failed_checks > 0:
-                    f.write("## Recommendations\n\n")
-                    f.write("The following issues were identified:\n\n")
-                    for result in self.results:
-                        if result['status'] == "FAIL":
-                            f.write(f"- **{result['section']} - {result['check']}**: {result['details']}\n")
-                    f.write("\n")
+                        if result.status == "FAIL":
+                            append(f"- **{result.section} - {result.check}**: {result.details}\n")
+                append("\n")
+            
+            with open(report_path, 'w', encoding='utf-8') as f:
+                f.write("".join(parts))
             
             self.log_result("Report Generation", "Markdown report created", "PASS", f"Report saved to: {report_path}")
             
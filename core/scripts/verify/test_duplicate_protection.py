@@ -7,10 +7,15 @@ Tests all 3 scenarios: unique import, exact duplicate, semantic duplicate
 import sys
 import os
 import argparse
+import contextlib
+import importlib
+import io
+import re
 import tempfile
 import shutil
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional, Tuple
 import logging
 from datetime import datetime
 
@@ -20,10 +25,8 @@ sys.path.insert(0, str(project_root))
 
 from core.config import Config
 from core.database.operations import BrokerReportOperations
-from core.scripts.import.import_reports import EnhancedReportImporter
 from core.utils.file_manager import FileManager
 from rich.console import Console
-from rich.table import Table
 
 # Setup logging
 logging.basicConfig(
@@ -34,29 +37,116 @@ logger = logging.getLogger(__name__)
 
 console = Console()
 
+# Shared by the tester and main(); Config only carries class-level settings
+CONFIG = Config()
+
+# Set once ensure_test_directories() has created everything for this process
+_DIRS_READY = False
+
+def ensure_test_directories():
+    """Create inbox, parsed and archive directories once per process"""
+    global _DIRS_READY
+    if _DIRS_READY:
+        return
+    CONFIG.INBOX_PATH.mkdir(parents=True, exist_ok=True)
+    CONFIG.PARSED_PATH.mkdir(parents=True, exist_ok=True)
+    # Also creates ARCHIVE_PATH itself
+    CONFIG.ensure_archive_directories()
+    _DIRS_READY = True
+
+# importlib is needed because 'import' in core.scripts.import is a keyword
+EnhancedReportImporter = importlib.import_module('core.scripts.import.import_reports').EnhancedReportImporter
+
+# Broker/period shared by all generated test reports
+TEST_BROKER = "tinkoff"
+TEST_PERIOD = "2023-07"
+# Scratch root for test runs: beside the archive (same device, so hardlinks and
+# the importer's rename() work) but outside it, so leftovers never count as archived
+TEST_SCRATCH_ROOT = CONFIG.ARCHIVE_PATH.parent / '.duplicate_test'
+# LIKE pattern for records created from the generated test files
+TEST_FILE_NAME_LIKE = r"%test\_%"
+
+TEST_REPORT_TEMPLATE = """
+<html>
+<body>
+    <h1>{title}</h1>
+    <p>Account: 4000T49</p>
+    <p>Period: 2023-07</p>
+    <p>Broker: tinkoff</p>
+    {body}
+</body>
+</html>
+"""
+
+# Reasons that must appear in import_duplicates.log after the scenarios run
+EXPECTED_LOG_ENTRIES = [
+    "imported successfully",
+    "exact duplicate (hash match)",
+    "logical duplicate (same broker/account/period)"
+]
+EXPECTED_LOG_PATTERN = re.compile("|".join(map(re.escape, EXPECTED_LOG_ENTRIES)))
+
+# (file name, title, body) for: unique report, exact duplicate of it, and
+# semantic duplicate (different HTML, same broker/account/period)
+TEST_FILE_SPECS = [
+    ("test_unique_report.html", "Test Report 1",
+     "<p>This is a unique test report</p>"),
+    ("test_exact_duplicate.html", "Test Report 1",
+     "<p>This is a unique test report</p>"),
+    ("test_semantic_duplicate.html", "Test Report 1 - Different HTML",
+     "<p>This is a different HTML but same semantic data</p>\n"
+     "    <div>Additional content to make it different</div>"),
+]
+
 class DuplicateProtectionTester:
     """Tests duplicate protection functionality"""
     
-    def __init__(self):
-        self.config = Config()
+    def __init__(self, force_all: bool = False, verbose: bool = False):
+        self.config = CONFIG
+        # Run the duplicate scenarios even when the unique import failed
+        self.force_all = force_all
+        # Show the importer's per-file output instead of discarding it
+        self.verbose = verbose
         self.db_ops = BrokerReportOperations()
         self.file_manager = FileManager()
         self.test_stats = {
             'tests_run': 0,
             'tests_passed': 0,
             'tests_failed': 0,
+            'tests_skipped': 0,
             'errors': []
         }
         self.test_files = []
         self.test_dir = None
+        self._importer = None
+        # Size of import_duplicates.log before this run; only newer bytes are checked
+        self._log_start_offset = 0
+    
+    @property
+    def importer(self):
+        """Importer shared by all scenarios, created on first use
+        
+        Construction loads broker patterns and sets up DB/file helpers, so one
+        instance is reused rather than paying that cost per scenario.
+        """
+        if self._importer is None:
+            self._importer = EnhancedReportImporter()
+        return self._importer
     
     def setup_test_environment(self) -> bool:
         """Setup temporary test environment"""
         try:
-            # Create temporary test directory
-            self.test_dir = Path(tempfile.mkdtemp(prefix="duplicate_test_"))
+            # Create temporary test directory next to the archive so staged files
+            # can be hardlinked and the importer's rename() never crosses devices
+            ensure_test_directories()
+            TEST_SCRATCH_ROOT.mkdir(parents=True, exist_ok=True)
+            self.test_dir = Path(tempfile.mkdtemp(prefix="duplicate_test_", dir=TEST_SCRATCH_ROOT))
             logger.info(f"Created test directory: {self.test_dir}")
             
+            # Remember where this run's log entries will start
+            log_file = self.import_log_path()
+            self._log_start_offset = log_file.stat().st_size if log_file.exists() else 0
+            
             # Create test files
             self.create_test_files()
             
@@ -69,80 +159,86 @@ class DuplicateProtectionTester:
     def create_test_files(self):
         """Create test HTML files for testing"""
         try:
-            # Test file 1: Unique report
-            test_file_1 = self.test_dir / "test_unique_report.html"
-            with open(test_file_1, 'w', encoding='utf-8') as f:
-                f.write("""
-                <html>
-                <body>
-                    <h1>Test Report 1</h1>
-                    <p>Account: 4000T49</p>
-                    <p>Period: 2023-07</p>
-                    <p>Broker: tinkoff</p>
-                    <p>This is a unique test report</p>
-                </body>
-                </html>
-                """)
-            
-            # Test file 2: Exact duplicate of test_file_1
-            test_file_2 = self.test_dir / "test_exact_duplicate.html"
-            with open(test_file_2, 'w', encoding='utf-8') as f:
-                f.write("""
-                <html>
-                <body>
-                    <h1>Test Report 1</h1>
-                    <p>Account: 4000T49</p>
-                    <p>Period: 2023-07</p>
-                    <p>Broker: tinkoff</p>
-                    <p>This is a unique test report</p>
-                </body>
-                </html>
-                """)
-            
-            # Test file 3: Semantic duplicate (different HTML, same broker/account/period)
-            test_file_3 = self.test_dir / "test_semantic_duplicate.html"
-            with open(test_file_3, 'w', encoding='utf-8') as f:
-                f.write("""
-                <html>
-                <body>
-                    <h1>Test Report 1 - Different HTML</h1>
-                    <p>Account: 4000T49</p>
-                    <p>Period: 2023-07</p>
-                    <p>Broker: tinkoff</p>
-                    <p>This is a different HTML but same semantic data</p>
-                    <div>Additional content to make it different</div>
-                </body>
-                </html>
-                """)
-            
-            self.test_files = [test_file_1, test_file_2, test_file_3]
+            # Files are independent, so their writes can overlap; map() keeps spec order
+            with ThreadPoolExecutor(max_workers=len(TEST_FILE_SPECS)) as executor:
+                self.test_files = list(executor.map(self._write_test_file, TEST_FILE_SPECS))
+            
             logger.info(f"Created {len(self.test_files)} test files")
             
         except Exception as e:
             logger.error(f"Failed to create test files: {e}")
             raise
     
+    def _write_test_file(self, spec: Tuple[str, str, str]) -> Path:
+        """Render one (file name, title, body) spec into the test directory"""
+        file_name, title, body = spec
+        test_file = self.test_dir / file_name
+        test_file.write_text(TEST_REPORT_TEMPLATE.format(title=title, body=body), encoding='utf-8')
+        return test_file
+    
     def cleanup_test_environment(self):
         """Cleanup test environment"""
         try:
             if self.test_dir and self.test_dir.exists():
                 shutil.rmtree(self.test_dir)
                 logger.info(f"Cleaned up test directory: {self.test_dir}")
+            # Drop the scratch root too unless another run is still using it
+            with contextlib.suppress(OSError):
+                TEST_SCRATCH_ROOT.rmdir()
         except Exception as e:
             logger.error(f"Failed to cleanup test environment: {e}")
     
+    def import_log_path(self) -> Path:
+        """Path of the append-only log written by FileManager.log_import_event"""
+        return self.config.PROJECT_ROOT / 'diagnostics' / 'import_duplicates.log'
+    
+    def run_import(self, inbox: Path) -> bool:
+        """Import everything staged in inbox, discarding importer output unless verbose"""
+        if self.verbose:
+            return self.importer.import_reports(source=str(inbox), broker=None, dry_run=False)
+        with contextlib.redirect_stdout(io.StringIO()):
+            return self.importer.import_reports(source=str(inbox), broker=None, dry_run=False)
+    
+    def stage_test_file(self, index: int, scenario: str) -> Path:
+        """Link a test file into a scenario-private inbox and return that inbox
+        
+        Each scenario imports from its own directory so it never picks up files
+        staged by another scenario (or real reports waiting in the shared inbox).
+        The importer renames staged files away rather than modifying them, so a
+        hardlink is enough; copying is only a fallback for filesystems without links.
+        """
+        scenario_inbox = self.test_dir / 'inbox' / scenario
+        scenario_inbox.mkdir(parents=True, exist_ok=True)
+        source = self.test_files[index]
+        target = scenario_inbox / source.name
+        try:
+            os.link(source, target)
+        except OSError:
+            shutil.copy2(source, target)
+        return scenario_inbox
+    
+    def ensure_seed_record(self) -> bool:
+        """Import the unique report unless it is already in the database
+        
+        The duplicate scenarios need the original report to collide with; seeding
+        it here keeps them runnable on their own instead of relying on test 1.
+        """
+        if self.db_ops.get_report_by_filename(self.test_files[0].name):
+            return True
+        
+        seed_inbox = self.stage_test_file(0, 'seed')
+        return self.run_import(seed_inbox)
+    
     def test_unique_import(self) -> bool:
         """Test 1: Import unique report should succeed"""
         try:
             console.print("\n[bold blue]Test 1: Unique Import[/bold blue]")
             
-            # Copy first test file to inbox
-            inbox_file = self.config.INBOX_PATH / "test_unique_report.html"
-            shutil.copy2(self.test_files[0], inbox_file)
+            # Stage first test file in this scenario's inbox
+            scenario_inbox = self.stage_test_file(0, 'unique')
             
             # Run import
-            importer = EnhancedReportImporter()
-            success = importer.import_reports(source="inbox", broker=None, dry_run=False)
+            success = self.run_import(scenario_inbox)
             
             if not success:
                 console.print("[red]❌ Import failed[/red]")
@@ -155,7 +251,8 @@ class DuplicateProtectionTester:
                 return False
             
             # Check if record was inserted
-            reports = self.db_ops.list_reports(broker="tinkoff", period="2023-07")
+            reports = self.db_ops.list_reports(broker=TEST_BROKER, period=TEST_PERIOD,
+                                               file_name_like=TEST_FILE_NAME_LIKE)
             if not reports:
                 console.print("[red]❌ No record found in database[/red]")
                 return False
@@ -173,13 +270,15 @@ class DuplicateProtectionTester:
         try:
             console.print("\n[bold blue]Test 2: Exact Duplicate Detection[/bold blue]")
             
-            # Copy second test file (exact duplicate) to inbox
-            inbox_file = self.config.INBOX_PATH / "test_exact_duplicate.html"
-            shutil.copy2(self.test_files[1], inbox_file)
+            if not self.ensure_seed_record():
+                console.print("[red]❌ Failed to seed original report[/red]")
+                return False
+            
+            # Stage second test file (exact duplicate) in this scenario's inbox
+            scenario_inbox = self.stage_test_file(1, 'exact')
             
             # Run import
-            importer = EnhancedReportImporter()
-            success = importer.import_reports(source="inbox", broker=None, dry_run=False)
+            success = self.run_import(scenario_inbox)
             
             if not success:
                 console.print("[red]❌ Import failed[/red]")
@@ -191,8 +290,9 @@ class DuplicateProtectionTester:
                 console.print("[red]❌ File not moved to exact_duplicates/[/red]")
                 return False
             
-            # Check that no new record was inserted (should still be 1 from test 1)
-            reports = self.db_ops.list_reports(broker="tinkoff", period="2023-07")
+            # Check that no new record was inserted (should still be just the seed)
+            reports = self.db_ops.list_reports(broker=TEST_BROKER, period=TEST_PERIOD,
+                                               file_name_like=TEST_FILE_NAME_LIKE)
             if len(reports) != 1:
                 console.print(f"[red]❌ Expected 1 record, found {len(reports)}[/red]")
                 return False
@@ -210,13 +310,15 @@ class DuplicateProtectionTester:
         try:
             console.print("\n[bold blue]Test 3: Semantic Duplicate Detection[/bold blue]")
             
-            # Copy third test file (semantic duplicate) to inbox
-            inbox_file = self.config.INBOX_PATH / "test_semantic_duplicate.html"
-            shutil.copy2(self.test_files[2], inbox_file)
+            if not self.ensure_seed_record():
+                console.print("[red]❌ Failed to seed original report[/red]")
+                return False
+            
+            # Stage third test file (semantic duplicate) in this scenario's inbox
+            scenario_inbox = self.stage_test_file(2, 'semantic')
             
             # Run import
-            importer = EnhancedReportImporter()
-            success = importer.import_reports(source="inbox", broker=None, dry_run=False)
+            success = self.run_import(scenario_inbox)
             
             if not success:
                 console.print("[red]❌ Import failed[/red]")
@@ -228,8 +330,9 @@ class DuplicateProtectionTester:
                 console.print("[red]❌ File not moved to logical_duplicates/[/red]")
                 return False
             
-            # Check that no new record was inserted (should still be 1 from test 1)
-            reports = self.db_ops.list_reports(broker="tinkoff", period="2023-07")
+            # Check that no new record was inserted (should still be just the seed)
+            reports = self.db_ops.list_reports(broker=TEST_BROKER, period=TEST_PERIOD,
+                                               file_name_like=TEST_FILE_NAME_LIKE)
             if len(reports) != 1:
                 console.print(f"[red]❌ Expected 1 record, found {len(reports)}[/red]")
                 return False
@@ -248,23 +351,25 @@ class DuplicateProtectionTester:
             console.print("\n[bold blue]Verifying Logging[/bold blue]")
             
             # Check import_duplicates.log
-            log_file = self.config.PROJECT_ROOT / 'diagnostics' / 'import_duplicates.log'
+            log_file = self.import_log_path()
             if not log_file.exists():
                 console.print("[red]❌ import_duplicates.log not found[/red]")
                 return False
             
+            # Single streaming pass over entries written during this run; stop
+            # as soon as every expected entry has been seen
+            seen = set()
             with open(log_file, 'r', encoding='utf-8') as f:
-                log_content = f.read()
-            
-            # Check for expected log entries
-            expected_entries = [
-                "imported successfully",
-                "exact duplicate (hash match)",
-                "logical duplicate (same broker/account/period)"
-            ]
-            
-            for entry in expected_entries:
-                if entry not in log_content:
+                # A log truncated since setup is scanned from the start
+                if log_file.stat().st_size >= self._log_start_offset:
+                    f.seek(self._log_start_offset)
+                for line in f:
+                    seen.update(EXPECTED_LOG_PATTERN.findall(line))
+                    if len(seen) == len(EXPECTED_LOG_ENTRIES):
+                        break
+            
+            for entry in EXPECTED_LOG_ENTRIES:
+                if entry not in seen:
                     console.print(f"[red]❌ Missing log entry: {entry}[/red]")
                     return False
             
@@ -279,24 +384,36 @@ class DuplicateProtectionTester:
     def cleanup_test_data(self):
         """Cleanup test data from database and filesystem"""
         try:
-            # Remove test records from database
-            reports = self.db_ops.list_reports(broker="tinkoff", period="2023-07")
-            for report in reports:
-                if "test_" in report['file_name']:
-                    self.db_ops.delete_report(report['id'])
-                    logger.info(f"Deleted test record: {report['id']}")
-            
-            # Remove test files from archive directories
+            # Remove test records from database in a single statement
+            deleted_ids = self.db_ops.delete_reports_matching(TEST_FILE_NAME_LIKE, broker=TEST_BROKER, period=TEST_PERIOD)
+            for report_id in deleted_ids:
+                logger.info(f"Deleted test record: {report_id}")
+            
+            # Remove test files from archive directories (one scandir pass each)
             for archive_dir in [self.config.ARCHIVE_IMPORTED_PATH, 
                                self.config.ARCHIVE_EXACT_DUPLICATES_PATH, 
                                self.config.ARCHIVE_LOGICAL_DUPLICATES_PATH]:
-                for test_file in archive_dir.glob("test_*.html"):
-                    test_file.unlink()
-                    logger.info(f"Removed test file: {test_file}")
+                if not archive_dir.exists():
+                    continue
+                with os.scandir(archive_dir) as entries:
+                    for entry in entries:
+                        if entry.name.startswith("test_") and entry.name.endswith(".html") and entry.is_file():
+                            os.unlink(entry.path)
+                            logger.info(f"Removed test file: {entry.path}")
             
         except Exception as e:
             logger.error(f"Failed to cleanup test data: {e}")
     
+    def run_test(self, test) -> bool:
+        """Run one test method and record its outcome in test_stats"""
+        self.test_stats['tests_run'] += 1
+        passed = test()
+        if passed:
+            self.test_stats['tests_passed'] += 1
+        else:
+            self.test_stats['tests_failed'] += 1
+        return passed
+    
     def run_all_tests(self) -> bool:
         """Run all duplicate protection tests"""
         try:
@@ -308,36 +425,20 @@ class DuplicateProtectionTester:
                 return False
             
             try:
-                # Ensure archive directories exist
-                self.config.ensure_archive_directories()
-                
                 # Test 1: Unique import
-                self.test_stats['tests_run'] += 1
-                if self.test_unique_import():
-                    self.test_stats['tests_passed'] += 1
-                else:
-                    self.test_stats['tests_failed'] += 1
-                
-                # Test 2: Exact duplicate
-                self.test_stats['tests_run'] += 1
-                if self.test_exact_duplicate():
-                    self.test_stats['tests_passed'] += 1
-                else:
-                    self.test_stats['tests_failed'] += 1
+                unique_passed = self.run_test(self.test_unique_import)
                 
-                # Test 3: Semantic duplicate
-                self.test_stats['tests_run'] += 1
-                if self.test_semantic_duplicate():
-                    self.test_stats['tests_passed'] += 1
+                # Tests 2-3 need the unique report in the database; if importing it
+                # failed they would fail too, so skip them unless forced
+                if unique_passed or self.force_all:
+                    self.run_test(self.test_exact_duplicate)
+                    self.run_test(self.test_semantic_duplicate)
                 else:
-                    self.test_stats['tests_failed'] += 1
+                    console.print("[yellow]⚠️ Skipping duplicate tests: unique import failed[/yellow]")
+                    self.test_stats['tests_skipped'] += 2
                 
                 # Verify logging
-                self.test_stats['tests_run'] += 1
-                if self.verify_logging():
-                    self.test_stats['tests_passed'] += 1
-                else:
-                    self.test_stats['tests_failed'] += 1
+                self.run_test(self.verify_logging)
                 
                 # Generate test report
                 self.generate_test_report()
@@ -359,15 +460,12 @@ class DuplicateProtectionTester:
     
     def display_results(self):
         """Display test results"""
-        table = Table(title="Duplicate Protection Test Results")
-        table.add_column("Metric", style="cyan")
-        table.add_column("Count", style="magenta")
-        
-        table.add_row("Tests Run", str(self.test_stats['tests_run']))
-        table.add_row("Tests Passed", str(self.test_stats['tests_passed']))
-        table.add_row("Tests Failed", str(self.test_stats['tests_failed']))
-        
-        console.print(table)
+        stats = self.test_stats
+        console.print(
+            f"\nDuplicate Protection Test Results: "
+            f"run={stats['tests_run']} passed={stats['tests_passed']} failed={stats['tests_failed']} "
+            f"skipped={stats['tests_skipped']}"
+        )
         
         if self.test_stats['tests_failed'] == 0:
             console.print("[green]✅ All tests passed![/green]")
@@ -382,59 +480,62 @@ class DuplicateProtectionTester:
             
             report_path = diagnostics_dir / 'duplicate_protection_test.md'
             
-            with open(report_path, 'w', encoding='utf-8') as f:
-                f.write('# Duplicate Protection Test Report\n\n')
-                f.write(f"Generated: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n\n")
-                
-                f.write('## Test Results\n\n')
-                f.write(f"- **Tests Run**: {self.test_stats['tests_run']}\n")
-                f.write(f"- **Tests Passed**: {self.test_stats['tests_passed']}\n")
-                f.write(f"- **Tests Failed**: {self.test_stats['tests_failed']}\n\n")
-                
-                f.write('## Test Scenarios\n\n')
-                f.write('1. **Unique Import**: Import new report → moved to `imported/`\n')
-                f.write('2. **Exact Duplicate**: Re-import same file → moved to `exact_duplicates/`\n')
-                f.write('3. **Semantic Duplicate**: Import different HTML with same data → moved to `logical_duplicates/`\n')
-                f.write('4. **Logging Verification**: All events logged to `import_duplicates.log`\n\n')
-                
-                if self.test_stats['errors']:
-                    f.write('## Errors\n\n')
-                    for error in self.test_stats['errors']:
-                        f.write(f'- {error}\n')
-                    f.write('\n')
-                
-                f.write('## Status\n\n')
-                if self.test_stats['tests_failed'] == 0:
-                    f.write('✅ **ALL TESTS PASSED**\n\n')
-                    f.write('Duplicate protection is working correctly.\n')
-                else:
-                    f.write('❌ **SOME TESTS FAILED**\n\n')
-                    f.write('Review the test results and fix any issues.\n')
+            # Build the whole report in memory and write it with a single call
+            parts = []
+            append = parts.append
+            append('# Duplicate Protection Test Report\n\n')
+            append(f"Generated: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n\n")
+            
+            append('## Test Results\n\n')
+            append(f"- **Tests Run**: {self.test_stats['tests_run']}\n")
+            append(f"- **Tests Passed**: {self.test_stats['tests_passed']}\n")
+            append(f"- **Tests Failed**: {self.test_stats['tests_failed']}\n")
+            append(f"- **Tests Skipped**: {self.test_stats['tests_skipped']}\n\n")
+            
+            append('## Test Scenarios\n\n')
+            append('1. **Unique Import**: Import new report → moved to `imported/`\n')
+            append('2. **Exact Duplicate**: Re-import same file → moved to `exact_duplicates/`\n')
+            append('3. **Semantic Duplicate**: Import different HTML with same data → moved to `logical_duplicates/`\n')
+            append('4. **Logging Verification**: All events logged to `import_duplicates.log`\n\n')
+            
+            if self.test_stats['errors']:
+                append('## Errors\n\n')
+                for error in self.test_stats['errors']:
+                    append(f'- {error}\n')
+                append('\n')
+            
+            append('## Status\n\n')
+            if self.test_stats['tests_failed'] == 0:
+                append('✅ **ALL TESTS PASSED**\n\n')
+                append('Duplicate protection is working correctly.\n')
+            else:
+                append('❌ **SOME TESTS FAILED**\n\n')
+                append('Review the test results and fix any issues.\n')
+            
+            report_path.write_text(''.join(parts), encoding='utf-8')
             
             logger.info(f"Test report saved to: {report_path}")
             
         except Exception as e:
             logger.error(f"Failed to generate test report: {e}")
 
-def main():
+def main(argv: Optional[List[str]] = None):
     """Main CLI function"""
     parser = argparse.ArgumentParser(description="Test duplicate protection functionality")
-    parser.add_argument("--verbose", action="store_true", help="Show detailed output")
+    parser.add_argument("--verbose", action="store_true", help="Show the importer's per-file output")
+    parser.add_argument("--force-all", action="store_true",
+                        help="Run duplicate tests even if the unique import test fails")
     
-    args = parser.parse_args()
+    args = parser.parse_args(argv)
     
     # Ensure directories exist
-    config = Config()
     try:
-        config.INBOX_PATH.mkdir(parents=True, exist_ok=True)
-        config.ARCHIVE_PATH.mkdir(parents=True, exist_ok=True)
-        config.PARSED_PATH.mkdir(parents=True, exist_ok=True)
-        config.ensure_archive_directories()
+        ensure_test_directories()
     except Exception:
         pass
     
     # Run tests
-    tester = DuplicateProtectionTester()
+    tester = DuplicateProtectionTester(force_all=args.force_all, verbose=args.verbose)
     success = tester.run_all_tests()
     
     if success:
@@ -4,11 +4,23 @@ Import Integrity Verification Script
 Analyzes database records, file locations, and generates diagnostic reports
 """
 
+import os
 import sys
+import json
+import mmap
+import codecs
 import hashlib
 from pathlib import Path
+from typing import Dict, List, Optional, Tuple
 from datetime import datetime
-from collections import Counter
+from collections import Counter, defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from operator import itemgetter
+
+try:
+    import orjson
+except ImportError:  # optional accelerator, stdlib json is used otherwise
+    orjson = None
 
 # Add project root to Python path
 project_root = Path(__file__).parent.parent.parent.parent
@@ -16,31 +28,180 @@ sys.path.insert(0, str(project_root))
 
 from core.database.operations import BrokerReportOperations
 
+INBOX_PATH = Path("modules/broker-reports/inbox")
+ARCHIVE_PATH = Path("modules/broker-reports/archive")
+
+# Columns kept per record: file matching plus the diagnostic report's record table
+RECORD_COLUMNS = ['id', 'broker', 'account', 'period', 'file_name', 'file_hash', 'processing_status']
+
+# Digests from earlier runs, keyed by path and invalidated by mtime/size changes
+HASH_CACHE_PATH = Path("diagnostics") / ".hash_cache.json"
+
+HASH_CHUNK_SIZE = 1 << 20
+MIN_PARALLEL_HASH_FILES = 4
+HASH_CHUNKSIZE = 32
+
+def _list_html(directory: Path) -> Tuple[str, ...]:
+    """Names of the .html files in a directory, from a single os.scandir pass
+    
+    Matches Path.glob("*.html"): hidden files are skipped and a missing
+    directory lists as empty.
+    """
+    try:
+        with os.scandir(directory) as it:
+            return tuple(sorted(
+                e.name for e in it
+                if e.name.endswith('.html') and not e.name.startswith('.')
+                and e.is_file(follow_symlinks=False)
+            ))
+    except FileNotFoundError:
+        return ()
+
+def _is_utf8(buffer: mmap.mmap) -> bool:
+    """Check that a mapped file is valid UTF-8, decoding it chunk by chunk"""
+    decoder = codecs.getincrementaldecoder('utf-8')()
+    # Slicing a memoryview does not copy, so only the decoder output is allocated
+    with memoryview(buffer) as view:
+        try:
+            for start in range(0, len(view), HASH_CHUNK_SIZE):
+                decoder.decode(view[start:start + HASH_CHUNK_SIZE])
+            decoder.decode(b'', final=True)
+        except UnicodeDecodeError:
+            return False
+    return True
+
+def _sha256_text(file_path: Path) -> str:
+    """SHA-256 of a file's decoded text, streamed in 1 MiB chunks"""
+    h = hashlib.sha256(usedforsecurity=False)
+    with open(file_path, 'r', encoding='utf-8', errors='ignore') as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), ''):
+            h.update(chunk.encode('utf-8'))
+    return h.hexdigest()
+
+def sha256_file(file_path: Path) -> str:
+    """SHA-256 of a file's UTF-8 text, matching how the importer hashes reports
+    
+    Valid UTF-8 without carriage returns decodes and re-encodes to the same
+    bytes, so such files are hashed straight from a read-only mapping. Anything
+    else goes through the streamed text path.
+    """
+    with open(file_path, 'rb') as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return hashlib.sha256(b'', usedforsecurity=False).hexdigest()
+        if hasattr(os, 'posix_fadvise'):
+            os.posix_fadvise(f.fileno(), 0, 0, os.POSIX_FADV_SEQUENTIAL)
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            if mm.find(b'\r') == -1 and _is_utf8(mm):
+                return hashlib.sha256(mm, usedforsecurity=False).hexdigest()
+    return _sha256_text(file_path)
+
+def _hash_one(path_str: str) -> Tuple[str, Optional[str]]:
+    """Hash one file for a worker process, reporting read errors instead of raising"""
+    try:
+        return path_str, sha256_file(Path(path_str))
+    except Exception as e:
+        print(f"Error reading {Path(path_str).name}: {e}")
+        return path_str, None
+
+def load_hash_cache() -> Dict[str, list]:
+    """Load the digests saved by earlier runs ({path: [mtime_ns, size, sha256]})"""
+    try:
+        with open(HASH_CACHE_PATH, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def save_hash_cache(cache: Dict[str, list]):
+    """Write the digest cache atomically so an interrupted run cannot corrupt it"""
+    HASH_CACHE_PATH.parent.mkdir(exist_ok=True)
+    tmp_path = HASH_CACHE_PATH.with_name(HASH_CACHE_PATH.name + '.tmp')
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(cache, f)
+    os.replace(tmp_path, HASH_CACHE_PATH)
+
+def batch_sha256_files(paths: List[Path], cache: Dict[str, list] = None) -> Dict[Path, str]:
+    """Hash a batch of files, each exactly once
+    
+    With a cache, files whose mtime and size match a cached entry are not read
+    again, and fresh digests are added to it. Batches of MIN_PARALLEL_HASH_FILES
+    or more are spread over a process pool; decoding the report text holds the
+    GIL, so threads would not scale. Unreadable files are reported and left out
+    of the result.
+    """
+    digests = {}
+    stats = {}
+    for file_path in paths:
+        path_str = str(file_path)
+        try:
+            st = os.stat(path_str)
+        except OSError:
+            continue
+        stats[path_str] = [st.st_mtime_ns, st.st_size]
+        entry = cache.get(path_str) if cache is not None else None
+        if entry and entry[:2] == stats[path_str]:
+            digests[path_str] = entry[2]
+    
+    pending = [str(file_path) for file_path in paths if str(file_path) not in digests]
+    if len(pending) < MIN_PARALLEL_HASH_FILES:
+        results = [_hash_one(path_str) for path_str in pending]
+    else:
+        workers = min(os.cpu_count() or 1, len(pending))
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            results = list(executor.map(_hash_one, pending, chunksize=HASH_CHUNKSIZE))
+    
+    for path_str, digest in results:
+        if digest is None:
+            continue
+        digests[path_str] = digest
+        if cache is not None and path_str in stats:
+            cache[path_str] = stats[path_str] + [digest]
+    
+    return {file_path: digests[str(file_path)] for file_path in paths if str(file_path) in digests}
+
+def count_record_fields(reports: List[Dict]) -> Dict:
+    """Compute summary_counts() from already fetched records, for when the SQL aggregate fails"""
+    counts = {
+        'total': len(reports),
+        'by_account': dict(Counter(map(itemgetter('account'), reports))),
+        'by_period': dict(Counter(map(itemgetter('period'), reports))),
+        'status_raw': sum(status == 'raw' for status in map(itemgetter('processing_status'), reports)),
+    }
+    for key, field in (('has_broker', 'broker'), ('has_account', 'account'), ('has_period', 'period'),
+                       ('has_hash', 'file_hash'), ('has_filename', 'file_name')):
+        counts[key] = sum(map(bool, map(itemgetter(field), reports)))
+    return counts
+
 def analyze_database():
     """Analyze database records"""
     print("=== Database Analysis ===")
     
     db_ops = BrokerReportOperations()
-    reports = db_ops.list_reports(limit=1000)
+    
+    counts = db_ops.summary_counts()
+    
+    # Later steps need the record metadata, not the stored report content
+    reports = list(db_ops.iter_reports(columns=RECORD_COLUMNS))
+    
+    if not counts:
+        # Aggregate query failed (already logged); count from the streamed records instead
+        counts = count_record_fields(reports)
     
     print(f"Total records in broker_reports: {len(reports)}")
     
     # Analyze by account
-    accounts = Counter(r['account'] for r in reports)
-    print(f"By account: {dict(accounts)}")
+    print(f"By account: {counts.get('by_account', {})}")
     
     # Analyze by period
-    periods = Counter(r['period'] for r in reports)
-    print(f"By period: {dict(periods)}")
+    print(f"By period: {counts.get('by_period', {})}")
     
     # Check required fields
-    total = len(reports)
-    has_broker = sum(1 for r in reports if r.get('broker'))
-    has_account = sum(1 for r in reports if r.get('account'))
-    has_period = sum(1 for r in reports if r.get('period'))
-    has_hash = sum(1 for r in reports if r.get('file_hash'))
-    has_filename = sum(1 for r in reports if r.get('file_name'))
-    status_raw = sum(1 for r in reports if r.get('processing_status') == 'raw')
+    total = counts.get('total', 0)
+    has_broker = counts.get('has_broker', 0)
+    has_account = counts.get('has_account', 0)
+    has_period = counts.get('has_period', 0)
+    has_hash = counts.get('has_hash', 0)
+    has_filename = counts.get('has_filename', 0)
+    status_raw = counts.get('status_raw', 0)
     
     print(f"\nField completeness:")
     print(f"  Total records: {total}")
@@ -57,11 +218,8 @@ def analyze_file_locations():
     """Analyze file locations"""
     print("\n=== File Location Analysis ===")
     
-    inbox_path = Path("modules/broker-reports/inbox")
-    archive_path = Path("modules/broker-reports/archive")
-    
-    inbox_files = list(inbox_path.glob("*.html"))
-    archive_files = list(archive_path.glob("*.html"))
+    inbox_files = [INBOX_PATH / name for name in _list_html(INBOX_PATH)]
+    archive_files = [ARCHIVE_PATH / name for name in _list_html(ARCHIVE_PATH)]
     
     print(f"Files in inbox: {len(inbox_files)}")
     print(f"Files in archive: {len(archive_files)}")
@@ -78,36 +236,38 @@ def analyze_file_locations():
     
     return inbox_files, archive_files
 
-def analyze_pending_files(reports):
+def analyze_pending_files(reports, inbox_files, hash_cache=None):
     """Analyze pending files in inbox"""
     print("\n=== Pending Files Analysis ===")
     
-    inbox_path = Path("modules/broker-reports/inbox")
-    inbox_files = list(inbox_path.glob("*.html"))
+    # Index records once so each inbox file is matched by lookup, not by scanning
+    by_name = {r['file_name']: r for r in reports}
+    by_hash = {}
+    for r in reports:
+        if r.get('file_hash'):
+            by_hash.setdefault(r['file_hash'], r)
+    
+    hashes = batch_sha256_files(inbox_files, hash_cache)
     
     results = []
+    status_counts = {}
     
     for file_path in inbox_files:
         filename = file_path.name
         print(f"\nAnalyzing: {filename}")
         
-        # Read content and calculate hash
-        try:
-            with open(file_path, 'r', encoding='utf-8', errors='ignore') as f:
-                content = f.read()
-            file_hash = hashlib.sha256(content.encode('utf-8')).hexdigest()
-        except Exception as e:
-            print(f"  Error reading file: {e}")
+        # Hash was computed above; unreadable files were already reported
+        file_hash = hashes.get(file_path)
+        if file_hash is None:
+            print(f"  Skipped: file could not be read")
             continue
         
         # Check if file exists in database by name
-        in_db_by_name = any(r['file_name'] == filename for r in reports)
+        in_db_by_name = filename in by_name
         
         # Check if hash exists in database (duplicate content)
-        in_db_by_hash = any(r.get('file_hash') == file_hash for r in reports)
-        
-        # Find matching record
-        matching_record = next((r for r in reports if r.get('file_hash') == file_hash), None)
+        matching_record = by_hash.get(file_hash)
+        in_db_by_hash = matching_record is not None
         
         status = "unknown"
         reason = ""
@@ -130,6 +290,7 @@ def analyze_pending_files(reports):
             'in_db_by_hash': in_db_by_hash,
             'file_hash': file_hash[:16] + '...'
         })
+        status_counts[status] = status_counts.get(status, 0) + 1
         
         print(f"  Status: {status}")
         print(f"  Reason: {reason}")
@@ -137,24 +298,26 @@ def analyze_pending_files(reports):
     
     # Summary
     print(f"\n=== Pending Files Summary ===")
-    status_counts = Counter(r['status'] for r in results)
     for status, count in status_counts.items():
         print(f"{status}: {count}")
     
     return results
 
-def cross_reference_verification(reports):
+def cross_reference_verification(reports, archive_files):
     """Cross-reference database with file system"""
     print("\n=== Cross-Reference Verification ===")
     
-    archive_path = Path("modules/broker-reports/archive")
-    archive_files = set(f.name for f in archive_path.glob("*.html"))
-    db_filenames = set(r['file_name'] for r in reports)
+    # One walk over both name lists: bit 0 = in DB, bit 1 = in archive
+    presence = defaultdict(int)
+    for r in reports:
+        presence[r['file_name']] |= 1
+    for file_path in archive_files:
+        presence[file_path.name] |= 2
     
-    missing_in_archive = db_filenames - archive_files
-    missing_in_db = archive_files - db_filenames
+    missing_in_archive = [name for name, bits in presence.items() if bits == 1]
+    missing_in_db = [name for name, bits in presence.items() if bits == 2]
     
-    print(f"Files in DB: {len(db_filenames)}")
+    print(f"Files in DB: {sum(1 for bits in presence.values() if bits & 1)}")
     print(f"Files in archive: {len(archive_files)}")
     print(f"Missing in archive: {len(missing_in_archive)}")
     print(f"Missing in DB: {len(missing_in_db)}")
@@ -171,37 +334,40 @@ def cross_reference_verification(reports):
     
     return missing_in_archive, missing_in_db
 
-def validate_file_hashes(reports):
+def validate_file_hashes(reports, archive_files, hash_cache=None):
     """Validate file hashes"""
     print("\n=== Hash Validation ===")
     
-    archive_path = Path("modules/broker-reports/archive")
+    archive_names = {file_path.name for file_path in archive_files}
     mismatches = []
     validated = 0
     not_found = 0
     
+    # Resolve which records have an archived file, then hash those files in one batch
+    archived = []
     for report in reports:
-        file_path = archive_path / report['file_name']
-        if file_path.exists():
-            try:
-                with open(file_path, 'r', encoding='utf-8', errors='ignore') as f:
-                    content = f.read()
-                file_hash = hashlib.sha256(content.encode('utf-8')).hexdigest()
-                
-                if file_hash == report.get('file_hash'):
-                    validated += 1
-                else:
-                    mismatches.append({
-                        'id': report['id'],
-                        'file_name': report['file_name'],
-                        'db_hash': report['file_hash'][:16] + '...',
-                        'file_hash': file_hash[:16] + '...'
-                    })
-            except Exception as e:
-                print(f"Error reading {report['file_name']}: {e}")
+        if report['file_name'] in archive_names:
+            archived.append((report, ARCHIVE_PATH / report['file_name']))
         else:
             not_found += 1
     
+    hashes = batch_sha256_files([file_path for _, file_path in archived], hash_cache)
+    
+    for report, file_path in archived:
+        file_hash = hashes.get(file_path)
+        if file_hash is None:
+            continue
+        
+        if file_hash == report.get('file_hash'):
+            validated += 1
+        else:
+            mismatches.append({
+                'id': report['id'],
+                'file_name': report['file_name'],
+                'db_hash': (report.get('file_hash') or '')[:16] + '...',
+                'file_hash': file_hash[:16] + '...'
+            })
+    
     print(f"Hash validation: {validated}/{len(reports)} OK")
     print(f"Files not found in archive: {not_found}")
     
@@ -212,6 +378,12 @@ def validate_file_hashes(reports):
     
     return validated, mismatches, not_found
 
+def dump_report_json(payload: Dict) -> bytes:
+    """Serialize the structured report, with orjson when it is installed"""
+    if orjson is not None:
+        return orjson.dumps(payload, option=orjson.OPT_INDENT_2, default=str)
+    return json.dumps(payload, indent=2, ensure_ascii=False, default=str).encode('utf-8')
+
 def generate_diagnostic_report(reports, inbox_files, archive_files, pending_results, missing_in_archive, missing_in_db, validated, mismatches, not_found):
     """Generate comprehensive diagnostic report"""
     
@@ -232,7 +404,32 @@ def generate_diagnostic_report(reports, inbox_files, archive_files, pending_resu
     if issues and len(issues) == 1 and "inbox" in issues[0]:
         status = "WARNING"
     
-    report_content = f"""# Import Integrity Report
+    # Structured form of the report; the markdown preview table is rendered from it
+    payload = {
+        'meta': {'generated': timestamp, 'status': status},
+        'summary': {
+            'records': len(reports),
+            'archive_files': len(archive_files),
+            'inbox_files': len(inbox_files),
+            'hash_validated': validated,
+            'hash_not_found': not_found,
+        },
+        'issues': issues,
+        'reports_preview': reports[:10],
+        'pending': pending_results,
+        'missing_in_archive': list(missing_in_archive),
+        'missing_in_db': list(missing_in_db),
+        'hash_mismatches': mismatches,
+    }
+    
+    # Status marks, decided once
+    db_mark = '✅' if len(reports) > 0 else '❌'
+    archive_mark = '✅' if len(archive_files) > 0 else '❌'
+    inbox_mark = '⚠️' if len(inbox_files) > 0 else '✅'
+    names_mark = '✅' if not missing_in_archive else '❌'
+    hash_mark = '✅' if validated == len(reports) else '❌'
+    
+    parts = [f"""# Import Integrity Report
 
 **Generated**: {timestamp}
 **Status**: {status}
@@ -247,16 +444,16 @@ def generate_diagnostic_report(reports, inbox_files, archive_files, pending_resu
 
 ## Database Verification
 
-- Records in broker_reports: {len(reports)} {'✅' if len(reports) > 0 else '❌'}
+- Records in broker_reports: {len(reports)} {db_mark}
 - All required fields populated: ✅
 - All records in 'raw' status: ✅
 
 ## Archive Verification
 
-- Files in archive: {len(archive_files)} {'✅' if len(archive_files) > 0 else '❌'}
-- Files in inbox: {len(inbox_files)} {'⚠️' if len(inbox_files) > 0 else '✅'}
-- Filename consistency: {'✅' if not missing_in_archive else '❌'}
-- Hash validation: {validated}/{len(reports)} {'✅' if validated == len(reports) else '❌'}
+- Files in archive: {len(archive_files)} {archive_mark}
+- Files in inbox: {len(inbox_files)} {inbox_mark}
+- Filename consistency: {names_mark}
+- Hash validation: {validated}/{len(reports)} {hash_mark}
 
 ## Detailed Analysis
 
@@ -264,34 +461,34 @@ def generate_diagnostic_report(reports, inbox_files, archive_files, pending_resu
 
 | ID | Account | Period | Broker | File Name | Status |
 |----|---------|--------|--------|-----------|--------|
-"""
+"""]
     
-    for report in reports[:10]:  # Show first 10
-        report_content += f"| {report['id']} | {report['account']} | {report['period']} | {report['broker']} | {report['file_name'][:30]}... | {report['processing_status']} |\n"
+    parts.extend(
+        f"| {report['id']} | {report['account']} | {report['period']} | {report['broker']} | {report['file_name'][:30]}... | {report['processing_status']} |\n"
+        for report in payload['reports_preview']  # Show first 10
+    )
     
     if len(reports) > 10:
-        report_content += f"| ... | ... | ... | ... | ... | ... |\n"
-        report_content += f"| Total: {len(reports)} records |\n"
+        parts.append(f"| ... | ... | ... | ... | ... | ... |\n")
+        parts.append(f"| Total: {len(reports)} records |\n")
     
-    report_content += f"""
+    parts.append("""
 ### Pending Files in Inbox
 
 | File Name | Status | Reason |
 |-----------|--------|--------|
-"""
+""")
     
-    for result in pending_results:
-        report_content += f"| {result['filename']} | {result['status']} | {result['reason']} |\n"
+    parts.extend(f"| {result['filename']} | {result['status']} | {result['reason']} |\n" for result in pending_results)
     
     if issues:
-        report_content += f"""
+        parts.append("""
 ## Issues Found
 
-"""
-        for issue in issues:
-            report_content += f"- ⚠️ **{issue}**\n"
+""")
+        parts.extend(f"- ⚠️ **{issue}**\n" for issue in issues)
     
-    report_content += f"""
+    parts.append(f"""
 ## Root Cause Analysis
 
 The import process created database records but failed to move files to archive. This suggests:
@@ -310,7 +507,8 @@ The import process created database records but failed to move files to archive.
 
 ## Integrity Status: {status}
 
-"""
+""")
+    report_content = "".join(parts)
     
     # Write report
     diagnostics_dir = Path("diagnostics")
@@ -320,8 +518,13 @@ The import process created database records but failed to move files to archive.
     with open(report_path, 'w', encoding='utf-8') as f:
         f.write(report_content)
     
+    json_path = report_path.with_suffix('.json')
+    with open(json_path, 'wb') as f:
+        f.write(dump_report_json(payload))
+    
     print(f"\n=== Diagnostic Report Generated ===")
     print(f"Report saved to: {report_path}")
+    print(f"JSON data saved to: {json_path}")
     print(f"Status: {status}")
     
     return report_path
@@ -338,13 +541,15 @@ def main():
     inbox_files, archive_files = analyze_file_locations()
     
     # Step 3: Analyze pending files
-    pending_results = analyze_pending_files(reports)
+    hash_cache = load_hash_cache()
+    pending_results = analyze_pending_files(reports, inbox_files, hash_cache)
     
     # Step 4: Cross-reference verification
-    missing_in_archive, missing_in_db = cross_reference_verification(reports)
+    missing_in_archive, missing_in_db = cross_reference_verification(reports, archive_files)
     
     # Step 5: Validate file hashes
-    validated, mismatches, not_found = validate_file_hashes(reports)
+    validated, mismatches, not_found = validate_file_hashes(reports, archive_files, hash_cache)
+    save_hash_cache(hash_cache)
     
     # Step 6: Generate diagnostic report
     report_path = generate_diagnostic_report(
@@ -7,20 +7,23 @@ import sys
 from pathlib import Path
 import argparse
 from datetime import datetime
-from typing import Dict, Any, List, Tuple
+from typing import Dict, Any, List, Tuple, TYPE_CHECKING
+from concurrent.futures import ProcessPoolExecutor, as_completed
 
 # Add project root to Python path
 project_root = Path(__file__).parent.parent.parent.parent
 sys.path.insert(0, str(project_root))
 
-from core.database.operations import BrokerReportOperations
-from core.parsers.sber_html_parser import SberHtmlParser
 from core.config import Config
-from rich.console import Console
-from rich.table import Table
-from rich.panel import Panel
 import logging
 
+# The DB layer, parser and rich are imported where first needed, so --help and
+# argument errors return without loading them
+if TYPE_CHECKING:
+    from core.database.operations import BrokerReportOperations
+    from core.parsers.sber_html_parser import SberHtmlParser
+    from rich.console import Console
+
 # Setup logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -34,14 +37,19 @@ def compare_values(db_value, html_value, field_name: str) -> Tuple[bool, str]:
     if db_value is None or html_value is None:
         return False, f"One is null: DB={db_value}, HTML={html_value}"
     
+    # Equal values need no type-specific handling
+    if db_value is html_value or db_value == html_value:
+        return True, "Match"
+    
     # Handle different data types
     if isinstance(db_value, (int, float)) and isinstance(html_value, (int, float)):
         # Numeric comparison with small tolerance
         tolerance = 0.01
-        if abs(db_value - html_value) <= tolerance:
+        difference = abs(db_value - html_value)
+        if difference <= tolerance:
             return True, "Match"
         else:
-            return False, f"Difference: {abs(db_value - html_value):.2f}"
+            return False, f"Difference: {difference:.2f}"
     
     # String comparison
     if str(db_value).strip() == str(html_value).strip():
@@ -68,71 +76,139 @@ def format_value(value: Any, field_name: str) -> str:
         return str(value)
 
 
-def verify_report(report_id: int, ops: BrokerReportOperations) -> Dict[str, Any]:
-    """Verify a single report by comparing DB data with fresh HTML parse"""
-    try:
-        # Get report from database
-        report = ops.get_report(report_id)
-        if not report:
-            raise ValueError(f"Report {report_id} not found")
+FIELDS_TO_COMPARE = [
+    ("balance_ending", "Balance Ending"),
+    ("account_open_date", "Account Open Date"),
+    ("trade_count", "Trade Count"),
+    ("instruments", "Instruments Count"),
+    ("financial_result", "Financial Result")
+]
+
+# One parser per process, created on first use and reused for every report
+_PARSER = None
+
+
+def _get_parser() -> 'SberHtmlParser':
+    """Return this process's shared parser, creating it on first use"""
+    global _PARSER
+    if _PARSER is None:
+        from core.parsers.sber_html_parser import SberHtmlParser
+        _PARSER = SberHtmlParser()
+    return _PARSER
+
+
+def parse_report_html(html_content: str) -> Dict[str, Any]:
+    """Parse report HTML with the shared parser, dropping the previous report's field log"""
+    parser = _get_parser()
+    parser.clear_logs()
+    return parser.parse(html_content)
+
+
+def load_report_for_verification(report_id: int, ops: 'BrokerReportOperations') -> Dict[str, Any]:
+    """Fetch a report and check it has both HTML content and parsed data"""
+    report = ops.get_report(report_id)
+    if not report:
+        raise ValueError(f"Report {report_id} not found")
+    
+    if not report.get('html_content'):
+        raise ValueError(f"Report {report_id} has no HTML content")
+    
+    if not report.get('parsed_data'):
+        raise ValueError(f"Report {report_id} not parsed yet")
+    
+    return report
+
+
+def build_verification_result(report: Dict[str, Any], fresh_parsed: Dict[str, Any]) -> Dict[str, Any]:
+    """Compare a report's stored parsed_data with a fresh parse of its HTML"""
+    parsed_data = report['parsed_data']
+    
+    # Nested sections are looked up once, not once per field
+    p_trades = parsed_data.get("trades", {})
+    f_trades = fresh_parsed.get("trades", {})
+    p_instr = parsed_data.get("instruments", [])
+    f_instr = fresh_parsed.get("instruments", [])
+    
+    comparisons = []
+    
+    for field_key, field_display in FIELDS_TO_COMPARE:
+        # Special handling for trade_count and instruments
+        if field_key == "trade_count":
+            db_value = p_trades.get("count", 0)
+            html_value = f_trades.get("count", 0)
+        elif field_key == "instruments":
+            db_value = len(p_instr)
+            html_value = len(f_instr)
+        else:
+            db_value = parsed_data.get(field_key)
+            html_value = fresh_parsed.get(field_key)
         
-        html_content = report.get('html_content')
-        if not html_content:
-            raise ValueError(f"Report {report_id} has no HTML content")
+        match, notes = compare_values(db_value, html_value, field_key)
         
-        parsed_data = report.get('parsed_data')
-        if not parsed_data:
-            raise ValueError(f"Report {report_id} not parsed yet")
+        comparisons.append({
+            "field": field_display,
+            "db_value": format_value(db_value, field_key),
+            "html_value": format_value(html_value, field_key),
+            "match": match,
+            "notes": notes
+        })
+    
+    return {
+        "report": report,
+        "comparisons": comparisons,
+        "all_match": all(comp["match"] for comp in comparisons),
+        "fresh_parsed": fresh_parsed
+    }
+
+
+def verify_report(report_id: int, ops: 'BrokerReportOperations') -> Dict[str, Any]:
+    """Verify a single report by comparing DB data with fresh HTML parse"""
+    try:
+        report = load_report_for_verification(report_id, ops)
         
         # Re-parse HTML to get "expected" values
-        parser = SberHtmlParser()
-        fresh_parsed = parser.parse(html_content)
-        
-        # Compare key fields
-        comparisons = []
-        
-        fields_to_compare = [
-            ("balance_ending", "Balance Ending"),
-            ("account_open_date", "Account Open Date"),
-            ("trade_count", "Trade Count"),
-            ("instruments", "Instruments Count"),
-            ("financial_result", "Financial Result")
-        ]
+        fresh_parsed = parse_report_html(report['html_content'])
         
-        for field_key, field_display in fields_to_compare:
-            db_value = parsed_data.get(field_key)
-            html_value = fresh_parsed.get(field_key)
-            
-            # Special handling for trade_count and instruments
-            if field_key == "trade_count":
-                db_value = parsed_data.get("trades", {}).get("count", 0)
-                html_value = fresh_parsed.get("trades", {}).get("count", 0)
-            elif field_key == "instruments":
-                db_value = len(parsed_data.get("instruments", []))
-                html_value = len(fresh_parsed.get("instruments", []))
-            
-            match, notes = compare_values(db_value, html_value, field_key)
-            
-            comparisons.append({
-                "field": field_display,
-                "db_value": format_value(db_value, field_key),
-                "html_value": format_value(html_value, field_key),
-                "match": match,
-                "notes": notes
-            })
-        
-        return {
-            "report": report,
-            "comparisons": comparisons,
-            "all_match": all(comp["match"] for comp in comparisons),
-            "fresh_parsed": fresh_parsed
-        }
+        return build_verification_result(report, fresh_parsed)
         
     except Exception as e:
         logger.error(f"Failed to verify report {report_id}: {e}")
         raise
 
 
+def verify_reports_batch(report_ids: List[int], ops: 'BrokerReportOperations',
+                         max_workers: int = None) -> List[Dict[str, Any]]:
+    """Verify several reports, re-parsing their HTML in parallel worker processes
+    
+    Reports are fetched in this process (the DB connection is not shared with
+    workers); each worker builds its parser up front and reuses it for all
+    the reports it handles. Reports that cannot be loaded or parsed are
+    logged and left out.
+    """
+    results = []
+    with ProcessPoolExecutor(max_workers=max_workers, initializer=_get_parser) as executor:
+        futures = {}
+        for report_id in report_ids:
+            try:
+                report = load_report_for_verification(report_id, ops)
+            except ValueError as e:
+                logger.error(f"Skipping report {report_id}: {e}")
+                continue
+            futures[executor.submit(parse_report_html, report['html_content'])] = report
+        
+        for future in as_completed(futures):
+            report = futures[future]
+            try:
+                fresh_parsed = future.result()
+            except Exception as e:
+                logger.error(f"Failed to verify report {report['id']}: {e}")
+                continue
+            results.append(build_verification_result(report, fresh_parsed))
+    
+    results.sort(key=lambda result: result["report"]["id"])
+    return results
+
+
 def generate_markdown_report(verification_result: Dict[str, Any], output_path: Path):
     """Generate markdown verification report"""
     report = verification_result["report"]
@@ -193,12 +269,84 @@ def generate_markdown_report(verification_result: Dict[str, Any], output_path: P
     logger.info(f"Verification report saved to {output_path}")
 
 
+def generate_batch_markdown_report(results: List[Dict[str, Any]], output_path: Path):
+    """Generate markdown summary for a batch verification run"""
+    timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    verified = sum(1 for result in results if result["all_match"])
+    
+    lines = [f"""# Database Data Verification Report (Batch)
+
+**Generated:** {timestamp}
+**Reports verified:** {len(results)}
+**All fields match:** {verified}/{len(results)}
+
+## Verification Results
+
+| Report ID | File | Account | Period | Match | Mismatched Fields |
+|-----------|------|---------|--------|-------|-------------------|"""]
+    
+    for result in results:
+        report = result["report"]
+        match_symbol = "✅" if result["all_match"] else "❌"
+        mismatched = ", ".join(comp["field"] for comp in result["comparisons"] if not comp["match"])
+        lines.append(f"| {report.get('id')} | {report.get('file_name', 'Unknown')} | {report.get('account', 'N/A')} | {report.get('period', 'N/A')} | {match_symbol} | {mismatched or '-'} |")
+    
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+    with open(output_path, 'w', encoding='utf-8') as f:
+        f.write("\n".join(lines) + "\n")
+    
+    logger.info(f"Batch verification report saved to {output_path}")
+
+
+def run_batch_verification(report_ids: List[int], ops: 'BrokerReportOperations', console: 'Console',
+                           output: str = None) -> int:
+    """Verify several reports and print a summary table"""
+    from rich.table import Table
+    from rich.panel import Panel
+    
+    console.print(f"[green]Verifying {len(report_ids)} reports[/green]")
+    
+    results = verify_reports_batch(report_ids, ops)
+    
+    table = Table(title="Batch Verification Results")
+    table.add_column("Report ID", style="cyan")
+    table.add_column("File", style="white")
+    table.add_column("Match", style="magenta")
+    table.add_column("Mismatched Fields", style="red")
+    
+    for result in results:
+        report = result["report"]
+        mismatched = ", ".join(comp["field"] for comp in result["comparisons"] if not comp["match"])
+        table.add_row(
+            str(report['id']),
+            report.get('file_name', 'Unknown'),
+            "✅" if result["all_match"] else "❌",
+            mismatched or "-"
+        )
+    
+    console.print(table)
+    
+    all_match = len(results) == len(report_ids) and all(result["all_match"] for result in results)
+    if all_match:
+        console.print(Panel(f"[green]✅ All {len(results)} reports match - Data integrity VERIFIED[/green]", title="Summary"))
+    else:
+        console.print(Panel(f"[red]❌ {sum(1 for r in results if r['all_match'])}/{len(report_ids)} reports fully match - Data integrity NEEDS ATTENTION[/red]", title="Summary"))
+    
+    output_path = Path(output) if output else Path("diagnostics/db_data_verification.md")
+    generate_batch_markdown_report(results, output_path)
+    console.print(f"[green]Verification report saved to {output_path}[/green]")
+    
+    return 0 if all_match else 1
+
+
 def main():
     parser = argparse.ArgumentParser(description="Verify report data from database")
     parser.add_argument("--report-id", type=int, help="Verify specific report by ID")
     parser.add_argument("--search", action="append", help="key=value; supports account", dest="search")
     parser.add_argument("--filter", action="append", help="key=value; broker, period, status, account", dest="filters")
     parser.add_argument("--output", help="Output file path (default: diagnostics/db_data_verification.md)")
+    parser.add_argument("--batch", action="store_true", help="Verify every matching report instead of a single one")
+    parser.add_argument("--limit", type=int, default=100, help="Maximum reports to verify with --batch (default: 100)")
     args = parser.parse_args()
 
     # Ensure directories exist
@@ -226,6 +374,11 @@ def main():
     filters = parse_filters(args.filters)
     search_map = parse_filters(args.search)
 
+    from core.database.operations import BrokerReportOperations
+    from rich.console import Console
+    from rich.table import Table
+    from rich.panel import Panel
+    
     ops = BrokerReportOperations()
     console = Console()
 
@@ -244,16 +397,20 @@ def main():
             status='parsed',  # Only verify parsed reports
             account=filters.get("account"),
             search_account=search_map.get("account"),
-            limit=1,  # Only one report for verification
-            offset=0
+            limit=args.limit if args.batch else 1,  # Only one report unless batch verification
+            offset=0,
+            columns=["id", "file_name"]  # Full rows are fetched per report during verification
         )
 
     if not reports:
         console.print("[yellow]No parsed reports found to verify[/yellow]")
         return 0
 
+    if args.batch:
+        return run_batch_verification([r['id'] for r in reports], ops, console, args.output)
+
     if len(reports) > 1:
-        console.print("[yellow]Multiple reports found. Please specify --report-id for single report verification[/yellow]")
+        console.print("[yellow]Multiple reports found. Please specify --report-id for single report verification or use --batch[/yellow]")
         return 1
 
     # Verify the report
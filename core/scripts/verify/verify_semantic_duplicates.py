@@ -2,6 +2,10 @@
 """
 Semantic duplicate verification script
 Validates parsed_data consistency and detects semantic duplicates
+
+Duplicate grouping is backed by the partial expression index ux_semantic_duplicate
+(core/database/schema.sql, created by core/scripts/migrate_db.py), which covers the
+same four parsed_data fields for rows WHERE parsed_data IS NOT NULL.
 """
 
 import sys
@@ -9,9 +13,10 @@ import os
 import argparse
 import json
 from pathlib import Path
-from typing import List, Dict, Any, Tuple
+from typing import List, Dict, Any
 import logging
 from datetime import datetime
+from operator import itemgetter
 
 # Add project root to Python path
 project_root = Path(__file__).parent.parent.parent.parent
@@ -31,6 +36,9 @@ logger = logging.getLogger(__name__)
 
 console = Console()
 
+# Builds the (broker, account_number, period_start, period_end) semantic key tuple in one call
+_SEMANTIC_KEY = itemgetter('broker', 'account_number', 'period_start', 'period_end')
+
 class SemanticDuplicateVerifier:
     """Verifies semantic duplicates in parsed_data"""
     
@@ -46,164 +54,73 @@ class SemanticDuplicateVerifier:
             'errors': []
         }
     
-    def get_parsed_reports(self) -> List[Dict[str, Any]]:
-        """Get all reports with parsed_data"""
-        try:
-            query = """
-                SELECT id, broker, account, period, parsed_data, file_name, created_at
-                FROM broker_reports 
-                WHERE parsed_data IS NOT NULL
-                ORDER BY created_at DESC
-            """
-            result = self.db_ops.execute_raw_query(query)
-            logger.info(f"Found {len(result)} reports with parsed_data")
-            return result
-        except Exception as e:
-            logger.error(f"Failed to get parsed reports: {e}")
-            return []
-    
-    def extract_semantic_fields(self, parsed_data: Dict[str, Any]) -> Dict[str, Any]:
-        """Extract semantic fields from parsed_data"""
-        try:
-            if not parsed_data:
-                return {}
-            
-            return {
-                'broker': parsed_data.get('broker'),
-                'account_number': parsed_data.get('account_number'),
-                'period_start': parsed_data.get('period_start'),
-                'period_end': parsed_data.get('period_end')
-            }
-        except Exception as e:
-            logger.error(f"Failed to extract semantic fields: {e}")
-            return {}
-    
-    def normalize_period(self, period_start: str, period_end: str) -> str:
-        """Normalize period to YYYY-MM format"""
-        try:
-            if not period_start:
-                return None
-            
-            # Extract YYYY-MM from period_start
-            if isinstance(period_start, str) and len(period_start) >= 7:
-                return period_start[:7]
-            
-            return None
-        except Exception as e:
-            logger.error(f"Failed to normalize period: {e}")
-            return None
+    def count_parsed_reports(self) -> int:
+        """Count reports with parsed_data"""
+        count = self.db_ops.count_reports_with_parsed_data()
+        logger.info(f"Found {count} reports with parsed_data")
+        return count
     
-    def check_period_consistency(self, report: Dict[str, Any]) -> Tuple[bool, str]:
-        """Check if top-level period matches parsed_data period"""
-        try:
-            top_level_period = report.get('period')
-            parsed_data = report.get('parsed_data', {})
-            
-            if not parsed_data:
-                return True, "No parsed_data"
-            
-            parsed_period_start = parsed_data.get('period_start')
-            parsed_period_end = parsed_data.get('period_end')
-            
-            if not parsed_period_start:
-                return True, "No period_start in parsed_data"
-            
-            # Normalize parsed period
-            normalized_parsed_period = self.normalize_period(parsed_period_start, parsed_period_end)
-            
-            if not normalized_parsed_period:
-                return True, "Could not normalize parsed period"
-            
-            # Check if periods match
-            if top_level_period == normalized_parsed_period:
-                return True, "Periods match"
-            else:
-                return False, f"Period mismatch: top-level='{top_level_period}' vs parsed='{normalized_parsed_period}'"
-                
-        except Exception as e:
-            logger.error(f"Failed to check period consistency: {e}")
-            return False, f"Error: {e}"
-    
-    def find_semantic_duplicates(self, reports: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
-        """Find semantic duplicates in parsed_data"""
-        try:
-            semantic_groups = {}
-            duplicates = []
-            
-            for report in reports:
-                parsed_data = report.get('parsed_data', {})
-                if not parsed_data:
-                    continue
-                
-                semantic_fields = self.extract_semantic_fields(parsed_data)
-                
-                # Create semantic key
-                semantic_key = (
-                    semantic_fields.get('broker'),
-                    semantic_fields.get('account_number'),
-                    semantic_fields.get('period_start'),
-                    semantic_fields.get('period_end')
-                )
-                
-                # Skip if any field is missing
-                if None in semantic_key:
-                    continue
-                
-                # Group by semantic key
-                if semantic_key not in semantic_groups:
-                    semantic_groups[semantic_key] = []
-                
-                semantic_groups[semantic_key].append(report)
-            
-            # Find groups with multiple reports
-            for semantic_key, group_reports in semantic_groups.items():
-                if len(group_reports) > 1:
-                    duplicates.append({
-                        'semantic_key': semantic_key,
-                        'reports': group_reports,
-                        'count': len(group_reports)
-                    })
-            
-            logger.info(f"Found {len(duplicates)} semantic duplicate groups")
-            return duplicates
-            
-        except Exception as e:
-            logger.error(f"Failed to find semantic duplicates: {e}")
+    def find_semantic_duplicates(self) -> List[Dict[str, Any]]:
+        """Find semantic duplicates in parsed_data
+        
+        Errors propagate to verify_semantic_consistency, which records them.
+        """
+        # Grouping happens in the database; only duplicate reports are fetched
+        groups = self.db_ops.get_semantic_duplicate_groups()
+        if not groups:
+            logger.info("Found 0 semantic duplicate groups")
             return []
+        
+        # One batched fetch for every report in every group (no per-report
+        # get_report() calls, i.e. no N+1); only the columns the conflicts
+        # report lists, so parsed_data is never loaded
+        duplicate_ids = [report_id for group in groups for report_id in group['ids']]
+        reports_by_id = self.db_ops.get_reports_by_ids(duplicate_ids, columns=['file_name', 'created_at'])
+        
+        duplicates = [{
+            'semantic_key': _SEMANTIC_KEY(group),
+            'reports': [reports_by_id[report_id] for report_id in group['ids'] if report_id in reports_by_id],
+            'count': group['count']
+        } for group in groups]
+        
+        logger.info(f"Found {len(duplicates)} semantic duplicate groups")
+        return duplicates
     
-    def verify_semantic_consistency(self) -> bool:
-        """Main verification function"""
+    def verify_semantic_consistency(self, write_markdown: bool = False) -> bool:
+        """Main verification function
+        
+        Stats are stored in verification_runs on every run; the markdown
+        report is only written when ``write_markdown`` is set.
+        """
         try:
             console.print("[bold blue]Semantic Duplicate Verification[/bold blue]\n")
             
-            # Get all parsed reports
-            reports = self.get_parsed_reports()
-            if not reports:
+            # Both checks run in the database, so only the count is needed here
+            parsed_count = self.count_parsed_reports()
+            if not parsed_count:
                 console.print("[yellow]No parsed reports found[/yellow]")
                 return True
             
-            self.verification_stats['total_reports'] = len(reports)
-            self.verification_stats['parsed_reports'] = len([r for r in reports if r.get('parsed_data')])
+            self.verification_stats['total_reports'] = parsed_count
+            self.verification_stats['parsed_reports'] = parsed_count
             
-            # Check period consistency
-            period_issues = []
-            for report in reports:
-                is_consistent, message = self.check_period_consistency(report)
-                if not is_consistent:
-                    period_issues.append({
-                        'report_id': report['id'],
-                        'file_name': report['file_name'],
-                        'issue': message
-                    })
+            # Check period consistency (compared in the database, only mismatches come back)
+            period_issues = [{
+                'report_id': r['id'],
+                'file_name': r['file_name'],
+                'issue': f"Period mismatch: top-level='{r['period']}' vs parsed='{r['parsed_period']}'"
+            } for r in self.db_ops.get_period_mismatches()]
             
             self.verification_stats['period_mismatches'] = len(period_issues)
             
             # Find semantic duplicates
-            semantic_duplicates = self.find_semantic_duplicates(reports)
+            semantic_duplicates = self.find_semantic_duplicates()
             self.verification_stats['semantic_conflicts'] = len(semantic_duplicates)
             
-            # Generate report
-            self.generate_verification_report(period_issues, semantic_duplicates)
+            # Record stats, then the optional markdown report
+            self.record_verification_run()
+            if write_markdown:
+                self.generate_verification_report(period_issues, semantic_duplicates)
             
             # Display summary
             self.display_summary()
@@ -228,6 +145,12 @@ class SemanticDuplicateVerifier:
         
         console.print(table)
     
+    def record_verification_run(self):
+        """Store this run's stats in verification_runs"""
+        run_id = self.db_ops.record_verification_run('semantic_duplicates', self.verification_stats)
+        if run_id:
+            logger.info(f"Verification stats recorded as run {run_id}")
+    
     def generate_verification_report(self, period_issues: List[Dict], semantic_duplicates: List[Dict]):
         """Generate detailed verification report"""
         try:
@@ -236,50 +159,52 @@ class SemanticDuplicateVerifier:
             
             report_path = diagnostics_dir / 'semantic_duplicate_conflicts.md'
             
-            with open(report_path, 'w', encoding='utf-8') as f:
-                f.write('# Semantic Duplicate Conflicts Report\n\n')
-                f.write(f"Generated: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n\n")
-                
-                f.write('## Summary\n\n')
-                f.write(f"- **Total Reports**: {self.verification_stats['total_reports']}\n")
-                f.write(f"- **Parsed Reports**: {self.verification_stats['parsed_reports']}\n")
-                f.write(f"- **Period Mismatches**: {self.verification_stats['period_mismatches']}\n")
-                f.write(f"- **Semantic Conflicts**: {self.verification_stats['semantic_conflicts']}\n\n")
-                
-                # Period issues
-                if period_issues:
-                    f.write('## Period Consistency Issues\n\n')
-                    for issue in period_issues:
-                        f.write(f"- **Report ID {issue['report_id']}** ({issue['file_name']}): {issue['issue']}\n")
-                    f.write('\n')
-                
-                # Semantic duplicates
-                if semantic_duplicates:
-                    f.write('## Semantic Duplicate Groups\n\n')
-                    for i, duplicate in enumerate(semantic_duplicates, 1):
-                        f.write(f'### Group {i}\n\n')
-                        f.write(f'**Semantic Key**: {duplicate["semantic_key"]}\n')
-                        f.write(f'**Count**: {duplicate["count"]} reports\n\n')
-                        f.write('**Reports**:\n')
-                        for report in duplicate['reports']:
-                            f.write(f'- ID {report["id"]}: {report["file_name"]} (created: {report["created_at"]})\n')
-                        f.write('\n')
-                
-                # Errors
-                if self.verification_stats['errors']:
-                    f.write('## Errors\n\n')
-                    for error in self.verification_stats['errors']:
-                        f.write(f'- {error}\n')
-                    f.write('\n')
-                
-                f.write('## Recommendations\n\n')
-                if period_issues:
-                    f.write('- Review period extraction logic in parsers\n')
-                if semantic_duplicates:
-                    f.write('- Consider consolidating semantic duplicate reports\n')
-                    f.write('- Review import logic for duplicate detection\n')
-                if not period_issues and not semantic_duplicates:
-                    f.write('- ✅ No semantic conflicts detected\n')
+            stats = self.verification_stats
+            parts = [
+                '# Semantic Duplicate Conflicts Report\n\n',
+                f"Generated: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n\n",
+                '## Summary\n\n',
+                f"- **Total Reports**: {stats['total_reports']}\n",
+                f"- **Parsed Reports**: {stats['parsed_reports']}\n",
+                f"- **Period Mismatches**: {stats['period_mismatches']}\n",
+                f"- **Semantic Conflicts**: {stats['semantic_conflicts']}\n\n",
+            ]
+            
+            # Period issues
+            if period_issues:
+                parts.append('## Period Consistency Issues\n\n')
+                parts.extend(f"- **Report ID {issue['report_id']}** ({issue['file_name']}): {issue['issue']}\n"
+                             for issue in period_issues)
+                parts.append('\n')
+            
+            # Semantic duplicates
+            if semantic_duplicates:
+                parts.append('## Semantic Duplicate Groups\n\n')
+                for i, duplicate in enumerate(semantic_duplicates, 1):
+                    parts.append(f'### Group {i}\n\n')
+                    parts.append(f'**Semantic Key**: {duplicate["semantic_key"]}\n')
+                    parts.append(f'**Count**: {duplicate["count"]} reports\n\n')
+                    parts.append('**Reports**:\n')
+                    parts.extend(f'- ID {report["id"]}: {report["file_name"]} (created: {report["created_at"]})\n'
+                                 for report in duplicate['reports'])
+                    parts.append('\n')
+            
+            # Errors
+            if stats['errors']:
+                parts.append('## Errors\n\n')
+                parts.extend(f'- {error}\n' for error in stats['errors'])
+                parts.append('\n')
+            
+            parts.append('## Recommendations\n\n')
+            if period_issues:
+                parts.append('- Review period extraction logic in parsers\n')
+            if semantic_duplicates:
+                parts.append('- Consider consolidating semantic duplicate reports\n')
+                parts.append('- Review import logic for duplicate detection\n')
+            if not period_issues and not semantic_duplicates:
+                parts.append('- ✅ No semantic conflicts detected\n')
+            
+            report_path.write_text(''.join(parts), encoding='utf-8')
             
             logger.info(f"Verification report saved to: {report_path}")
             
@@ -290,21 +215,24 @@ def main():
     """Main CLI function"""
     parser = argparse.ArgumentParser(description="Verify semantic duplicates in parsed_data")
     parser.add_argument("--verbose", action="store_true", help="Show detailed output")
+    parser.add_argument("--markdown", action="store_true",
+                        help="Also write diagnostics/semantic_duplicate_conflicts.md")
     
     args = parser.parse_args()
     
     # Ensure directories exist
     config = Config()
     try:
-        config.INBOX_PATH.mkdir(parents=True, exist_ok=True)
-        config.ARCHIVE_PATH.mkdir(parents=True, exist_ok=True)
-        config.PARSED_PATH.mkdir(parents=True, exist_ok=True)
+        # They almost always exist; only call mkdir for the ones that don't
+        for directory in (config.INBOX_PATH, config.ARCHIVE_PATH, config.PARSED_PATH):
+            if not directory.is_dir():
+                directory.mkdir(parents=True, exist_ok=True)
     except Exception:
         pass
     
     # Run verification
     verifier = SemanticDuplicateVerifier()
-    success = verifier.verify_semantic_consistency()
+    success = verifier.verify_semantic_consistency(write_markdown=args.markdown)
     
     if success:
         console.print("[green]✅ Semantic verification completed successfully![/green]")
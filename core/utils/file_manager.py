@@ -5,64 +5,173 @@ Handles file detection, metadata extraction, and safe file operations
 
 import os
 import re
+import time
+import mmap
+import atexit
 import hashlib
+import functools
+import threading
 import shutil
 import mimetypes
+from stat import S_ISREG
 from pathlib import Path
 from typing import Dict, Any, Optional, List, Tuple
+from concurrent.futures import ThreadPoolExecutor
 import logging
 from datetime import datetime
 
+from core.config import Config
+
 logger = logging.getLogger(__name__)
 
+# Read size for hashing when hashlib.file_digest is unavailable
+HASH_CHUNK_SIZE = 1 << 20
+
+# Files at least this large are hashed from a memory map
+MMAP_HASH_MIN_SIZE = 16 * 1024 * 1024
+
+# Head and tail of report content searched by extract_metadata_from_content
+METADATA_HEAD_CHARS = 65536
+METADATA_TAIL_CHARS = 16384
+
+# Text files at least this large are decoded from a memory map in read_file_content
+MMAP_READ_MIN_SIZE = 256 * 1024
+
+# Threads used by scan_directory to hash files
+SCAN_MAX_WORKERS = min(8, os.cpu_count() or 1)
+
+# Keywords identifying each broker in file names and report content
+_BROKER_KEYWORDS = {
+    'sber': [
+        r'сбербанк',
+        r'сбер',
+        r'sber',
+        r'отчет брокера',
+        r'брокерский отчет'
+    ],
+    'tinkoff': [
+        r'тинькофф',
+        r'tinkoff',
+        r'т-банк',
+        r'т банк'
+    ],
+    'vtb': [
+        r'втб',
+        r'vtb',
+        r'втб капитал'
+    ],
+    'gazprombank': [
+        r'газпромбанк',
+        r'gazprombank',
+        r'газпром'
+    ],
+    'alpha': [
+        r'альфа',
+        r'alpha',
+        r'альфа-банк'
+    ]
+}
+
+# Bare period and date patterns, shared by filename and content extraction
+# (IGNORECASE would not change what digit-only patterns match)
+_PERIOD_RE = re.compile(r'(\d{4}-\d{2})')        # Period like 2023-07
+_DATE_RE = re.compile(r'(\d{2}\.\d{2}\.\d{4})')  # Date like 29.12.2023
+
+# Common patterns for broker report filenames
+_FILENAME_PATTERNS = (
+    ('account', re.compile(r'([A-Z0-9]{6,10})')),  # Account numbers like 4000T49, S000T49
+    ('period', _PERIOD_RE),
+    ('date', _DATE_RE),
+    ('year', re.compile(r'(\d{4})')),              # Year
+    ('month', re.compile(r'(\d{1,2})'))            # Month
+)
+
+# Report content patterns, most specific first
+_ACCOUNT_PATTERNS = (
+    re.compile(r'счет[а-я\s]*:?\s*([A-Z0-9]{6,10})', re.IGNORECASE),
+    re.compile(r'account[:\s]*([A-Z0-9]{6,10})', re.IGNORECASE),
+    re.compile(r'№\s*([A-Z0-9]{6,10})', re.IGNORECASE),
+    re.compile(r'([A-Z0-9]{6,10})', re.IGNORECASE)
+)
+
+_PERIOD_PATTERNS = (
+    re.compile(r'период[а-я\s]*:?\s*(\d{4}-\d{2})', re.IGNORECASE),
+    re.compile(r'period[:\s]*(\d{4}-\d{2})', re.IGNORECASE),
+    _PERIOD_RE
+)
+
+_CLIENT_PATTERNS = (
+    re.compile(r'клиент[а-я\s]*:?\s*([А-Я][а-я]+\s+[А-Я]\.\s*[А-Я]\.)', re.IGNORECASE),
+    re.compile(r'client[:\s]*([А-Я][а-я]+\s+[А-Я]\.\s*[А-Я]\.)', re.IGNORECASE),
+    re.compile(r'([А-Я][а-я]+\s+[А-Я]\.\s*[А-Я]\.)', re.IGNORECASE)
+)
+
+_DATE_PATTERNS = (
+    re.compile(r'дата[а-я\s]*:?\s*(\d{2}\.\d{2}\.\d{4})', re.IGNORECASE),
+    re.compile(r'date[:\s]*(\d{2}\.\d{2}\.\d{4})', re.IGNORECASE),
+    _DATE_RE
+)
+
+# File types for extensions mimetypes does not know
+_FALLBACK_FILE_TYPES = {
+    '.html': 'text/html',
+    '.txt': 'text/plain',
+    '.pdf': 'application/pdf',
+    '.md': 'text/plain'
+}
+
+@functools.lru_cache(maxsize=None)
+def _file_type_for_suffix(suffix: str) -> str:
+    """MIME type for a lowercased file extension, 'unknown' if none is known"""
+    try:
+        mime_type, _ = mimetypes.guess_type(f"file{suffix}")
+    except Exception:
+        return "unknown"
+    return mime_type or _FALLBACK_FILE_TYPES.get(suffix, "unknown")
+
+# Directory holding import_duplicates.log
+_IMPORT_EVENTS_DIR = Config.PROJECT_ROOT / 'diagnostics'
+
+_IMPORT_EVENTS_LOCK = threading.Lock()
+
+# (second, formatted timestamp) of the last import event
+_last_event_timestamp = (None, '')
+
+def _event_timestamp() -> str:
+    """Local time as '%Y-%m-%d %H:%M:%S', formatted at most once per second"""
+    global _last_event_timestamp
+    now = int(time.time())
+    second, formatted = _last_event_timestamp
+    if second != now:
+        formatted = time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(now))
+        _last_event_timestamp = (now, formatted)
+    return formatted
+
+@functools.lru_cache(maxsize=None)
+def _import_events_log():
+    """Open diagnostics/import_duplicates.log once for line-buffered appends, closed at exit"""
+    _IMPORT_EVENTS_DIR.mkdir(parents=True, exist_ok=True)
+    
+    # Line buffering hands every event to the OS as soon as it is written, so
+    # a crash loses nothing and same-process readers see it immediately
+    log_handle = open(_IMPORT_EVENTS_DIR / 'import_duplicates.log', 'a', encoding='utf-8',
+                      buffering=1)
+    atexit.register(log_handle.close)
+    return log_handle
+
 class FileManager:
     """File management utilities for broker reports"""
     
     def __init__(self):
         self.supported_extensions = {'.html', '.txt', '.pdf', '.md'}
-        self.broker_patterns = {
-            'sber': [
-                r'сбербанк',
-                r'сбер',
-                r'sber',
-                r'отчет брокера',
-                r'брокерский отчет'
-            ],
-            'tinkoff': [
-                r'тинькофф',
-                r'tinkoff',
-                r'т-банк',
-                r'т банк'
-            ],
-            'vtb': [
-                r'втб',
-                r'vtb',
-                r'втб капитал'
-            ],
-            'gazprombank': [
-                r'газпромбанк',
-                r'gazprombank',
-                r'газпром'
-            ],
-            'alpha': [
-                r'альфа',
-                r'alpha',
-                r'альфа-банк'
-            ]
-        }
+        self.broker_patterns = _BROKER_KEYWORDS
     
     def detect_broker(self, content: str, file_name: str = "") -> Optional[str]:
         """Detect broker from content and filename"""
+        # The whole document votes: a generic phrase in the header (e.g. a sber
+        # keyword like 'отчет брокера') must not outweigh a broker named later
         text_to_analyze = f"{file_name} {content}".lower()
-        
-        broker_scores = {}
-        for broker, patterns in self.broker_patterns.items():
-            score = 0
-            for pattern in patterns:
-                matches = len(re.findall(pattern, text_to_analyze, re.IGNORECASE))
-                score += matches
-            if score > 0:
-                broker_scores[broker] = score
+        broker_scores = self._score_brokers(text_to_analyze)
         
         if broker_scores:
             best_broker = max(broker_scores, key=broker_scores.get)
@@ -71,21 +180,23 @@ class FileManager:
         
         return None
     
+    def _score_brokers(self, text: str) -> Dict[str, int]:
+        """Count broker keyword hits in lowercased text, in broker order"""
+        # Keywords are plain lowercase literals, so str.count does the
+        # matching without any regex machinery
+        broker_scores = {}
+        for broker, keywords in _BROKER_KEYWORDS.items():
+            score = sum(text.count(keyword) for keyword in keywords)
+            if score > 0:
+                broker_scores[broker] = score
+        return broker_scores
+    
     def extract_metadata_from_filename(self, file_name: str) -> Dict[str, Any]:
         """Extract metadata from filename patterns"""
         metadata = {}
         
-        # Common patterns for broker reports
-        patterns = {
-            'account': r'([A-Z0-9]{6,10})',  # Account numbers like 4000T49, S000T49
-            'period': r'(\d{4}-\d{2})',      # Period like 2023-07
-            'date': r'(\d{2}\.\d{2}\.\d{4})', # Date like 29.12.2023
-            'year': r'(\d{4})',              # Year
-            'month': r'(\d{1,2})'            # Month
-        }
-        
-        for key, pattern in patterns.items():
-            match = re.search(pattern, file_name)
+        for key, pattern in _FILENAME_PATTERNS:
+            match = pattern.search(file_name)
             if match:
                 metadata[key] = match.group(1)
         
@@ -99,57 +210,37 @@ class FileManager:
     
     def extract_metadata_from_content(self, content: str) -> Dict[str, Any]:
         """Extract metadata from HTML/content"""
+        # Account, period, client and date live in the report header or
+        # footer, so long content is searched in a head + tail window only
+        if len(content) > METADATA_HEAD_CHARS + METADATA_TAIL_CHARS:
+            content = f"{content[:METADATA_HEAD_CHARS]}\n{content[-METADATA_TAIL_CHARS:]}"
+        
         metadata = {}
         
         # Extract account number patterns
-        account_patterns = [
-            r'счет[а-я\s]*:?\s*([A-Z0-9]{6,10})',
-            r'account[:\s]*([A-Z0-9]{6,10})',
-            r'№\s*([A-Z0-9]{6,10})',
-            r'([A-Z0-9]{6,10})'
-        ]
-        
-        for pattern in account_patterns:
-            match = re.search(pattern, content, re.IGNORECASE)
+        for pattern in _ACCOUNT_PATTERNS:
+            match = pattern.search(content)
             if match:
                 metadata['account'] = match.group(1)
                 break
         
         # Extract period patterns
-        period_patterns = [
-            r'период[а-я\s]*:?\s*(\d{4}-\d{2})',
-            r'period[:\s]*(\d{4}-\d{2})',
-            r'(\d{4}-\d{2})'
-        ]
-        
-        for pattern in period_patterns:
-            match = re.search(pattern, content, re.IGNORECASE)
+        for pattern in _PERIOD_PATTERNS:
+            match = pattern.search(content)
             if match:
                 metadata['period'] = match.group(1)
                 break
         
         # Extract client name
-        client_patterns = [
-            r'клиент[а-я\s]*:?\s*([А-Я][а-я]+\s+[А-Я]\.\s*[А-Я]\.)',
-            r'client[:\s]*([А-Я][а-я]+\s+[А-Я]\.\s*[А-Я]\.)',
-            r'([А-Я][а-я]+\s+[А-Я]\.\s*[А-Я]\.)'
-        ]
-        
-        for pattern in client_patterns:
-            match = re.search(pattern, content, re.IGNORECASE)
+        for pattern in _CLIENT_PATTERNS:
+            match = pattern.search(content)
             if match:
                 metadata['client_name'] = match.group(1)
                 break
         
         # Extract report date
-        date_patterns = [
-            r'дата[а-я\s]*:?\s*(\d{2}\.\d{2}\.\d{4})',
-            r'date[:\s]*(\d{2}\.\d{2}\.\d{4})',
-            r'(\d{2}\.\d{2}\.\d{4})'
-        ]
-        
-        for pattern in date_patterns:
-            match = re.search(pattern, content, re.IGNORECASE)
+        for pattern in _DATE_PATTERNS:
+            match = pattern.search(content)
             if match:
                 try:
                     date_str = match.group(1)
@@ -160,28 +251,17 @@ class FileManager:
         
         return metadata
     
-    def get_file_info(self, file_path: Path) -> Dict[str, Any]:
-        """Get comprehensive file information"""
+    def get_file_info(self, file_path: Path, stat_result: os.stat_result = None) -> Dict[str, Any]:
+        """Get comprehensive file information
+        
+        Pass ``stat_result`` when the file was already stat'ed to skip another stat call.
+        """
         try:
-            stat = file_path.stat()
+            stat = stat_result or file_path.stat()
+            extension = file_path.suffix.lower()
             
-            # Get file type using mimetypes
-            try:
-                mime_type, _ = mimetypes.guess_type(str(file_path))
-                if mime_type:
-                    file_type = mime_type
-                elif file_path.suffix.lower() == '.html':
-                    file_type = 'text/html'
-                elif file_path.suffix.lower() == '.txt':
-                    file_type = 'text/plain'
-                elif file_path.suffix.lower() == '.pdf':
-                    file_type = 'application/pdf'
-                elif file_path.suffix.lower() == '.md':
-                    file_type = 'text/plain'
-                else:
-                    file_type = "unknown"
-            except:
-                file_type = "unknown"
+            # Get file type using mimetypes (cached per extension)
+            file_type = _file_type_for_suffix(extension)
             
             # Calculate file hash
             file_hash = self.calculate_file_hash(file_path)
@@ -194,7 +274,7 @@ class FileManager:
                 'file_type': file_type,
                 'created_at': datetime.fromtimestamp(stat.st_ctime),
                 'modified_at': datetime.fromtimestamp(stat.st_mtime),
-                'extension': file_path.suffix.lower()
+                'extension': extension
             }
         except Exception as e:
             logger.error(f"Failed to get file info for {file_path}: {e}")
@@ -202,12 +282,21 @@ class FileManager:
     
     def calculate_file_hash(self, file_path: Path) -> str:
         """Calculate SHA-256 hash of file"""
-        hash_sha256 = hashlib.sha256()
         try:
             with open(file_path, "rb") as f:
-                for chunk in iter(lambda: f.read(4096), b""):
+                # Large files are hashed straight from a memory map in one C call
+                size = os.fstat(f.fileno()).st_size
+                if size >= MMAP_HASH_MIN_SIZE:
+                    with mmap.mmap(f.fileno(), size, access=mmap.ACCESS_READ) as mm:
+                        return hashlib.sha256(mm).hexdigest()
+                
+                # file_digest (Python 3.11+) runs the read/update loop in C
+                if hasattr(hashlib, "file_digest"):
+                    return hashlib.file_digest(f, "sha256").hexdigest()
+                hash_sha256 = hashlib.sha256()
+                for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b""):
                     hash_sha256.update(chunk)
-            return hash_sha256.hexdigest()
+                return hash_sha256.hexdigest()
         except Exception as e:
             logger.error(f"Failed to calculate hash for {file_path}: {e}")
             return ""
@@ -216,16 +305,20 @@ class FileManager:
         """Read file content with size limit"""
         try:
             # Check file size
-            file_size_mb = file_path.stat().st_size / (1024 * 1024)
+            file_size = file_path.stat().st_size
+            file_size_mb = file_size / (1024 * 1024)
             if file_size_mb > max_size_mb:
                 logger.warning(f"File too large: {file_path} ({file_size_mb:.1f}MB)")
                 return None
             
             # Read content based on file type
-            if file_path.suffix.lower() in {'.html', '.txt', '.md'}:
+            extension = file_path.suffix.lower()
+            if extension in {'.html', '.txt', '.md'}:
+                if file_size >= MMAP_READ_MIN_SIZE:
+                    return self._read_text_mmap(file_path)
                 with open(file_path, 'r', encoding='utf-8') as f:
                     return f.read()
-            elif file_path.suffix.lower() == '.pdf':
+            elif extension == '.pdf':
                 # For PDF files, return placeholder for now
                 return f"[PDF_CONTENT_PLACEHOLDER: {file_path.name}]"
             else:
@@ -236,11 +329,40 @@ class FileManager:
             logger.error(f"Failed to read file {file_path}: {e}")
             return None
     
-    def is_supported_file(self, file_path: Path) -> bool:
-        """Check if file is supported for processing"""
-        return (file_path.suffix.lower() in self.supported_extensions and 
-                file_path.is_file() and 
-                file_path.stat().st_size > 0)
+    def _read_text_mmap(self, file_path: Path) -> str:
+        """Decode a UTF-8 file in one call from a memory map
+        
+        Same result as text-mode read(): strict decoding and universal newlines.
+        """
+        with open(file_path, 'rb') as f:
+            size = os.fstat(f.fileno()).st_size
+            if size == 0:
+                return ""
+            with mmap.mmap(f.fileno(), size, access=mmap.ACCESS_READ) as mm:
+                text = str(mm, 'utf-8')
+                has_cr = mm.find(b'\r') != -1
+        if has_cr:
+            text = text.replace('\r\n', '\n').replace('\r', '\n')
+        return text
+    
+    def is_supported_file(self, file_path: Path, stat_result: os.stat_result = None) -> bool:
+        """Check if file is supported for processing
+        
+        Pass ``stat_result`` when the file was already stat'ed to skip the stat call.
+        """
+        # Extension first, so unsupported files cost no syscall
+        if file_path.suffix.lower() not in self.supported_extensions:
+            return False
+        if stat_result is None:
+            try:
+                stat_result = file_path.stat()
+            except OSError:
+                return False
+        return self._is_nonempty_regular_file(stat_result)
+    
+    def _is_nonempty_regular_file(self, stat_result: os.stat_result) -> bool:
+        """Whether a stat result describes a regular file with content"""
+        return S_ISREG(stat_result.st_mode) and stat_result.st_size > 0
     
     def safe_move_file(self, source: Path, destination: Path) -> bool:
         """Safely move file with conflict resolution"""
@@ -275,11 +397,30 @@ class FileManager:
             logger.warning(f"Directory does not exist: {directory}")
             return files_info
         
-        for file_path in directory.iterdir():
-            if self.is_supported_file(file_path):
-                file_info = self.get_file_info(file_path)
-                if file_info:
-                    files_info.append(file_info)
+        # Entries with unsupported extensions are skipped without a stat call;
+        # the rest are stat'ed once and the result is reused by get_file_info
+        candidates = []
+        stat_results = []
+        with os.scandir(directory) as entries:
+            for entry in entries:
+                file_path = Path(entry.path)
+                if file_path.suffix.lower() not in self.supported_extensions:
+                    continue
+                try:
+                    stat_result = entry.stat()
+                except OSError:
+                    continue
+                # Extension already checked above, so only the stat result is tested
+                if self._is_nonempty_regular_file(stat_result):
+                    candidates.append(file_path)
+                    stat_results.append(stat_result)
+        
+        # Hashing releases the GIL, so files are processed concurrently
+        if len(candidates) > 1:
+            with ThreadPoolExecutor(max_workers=min(SCAN_MAX_WORKERS, len(candidates))) as executor:
+                files_info = [info for info in executor.map(self.get_file_info, candidates, stat_results) if info]
+        else:
+            files_info = [info for info in map(self.get_file_info, candidates, stat_results) if info]
         
         logger.info(f"Found {len(files_info)} supported files in {directory}")
         return files_info
@@ -287,13 +428,18 @@ class FileManager:
     def validate_file_integrity(self, file_path: Path) -> bool:
         """Validate file integrity and accessibility"""
         try:
-            # Check if file exists and is readable
-            if not file_path.exists() or not file_path.is_file():
+            # One stat covers existence and file type; os.access checks
+            # readability without opening the file
+            try:
+                stat_result = file_path.stat()
+            except FileNotFoundError:
+                return False
+            if not S_ISREG(stat_result.st_mode):
                 return False
             
-            # Check if file is readable
-            with open(file_path, 'rb') as f:
-                f.read(1)  # Try to read first byte
+            if not os.access(file_path, os.R_OK):
+                logger.error(f"File integrity check failed for {file_path}: not readable")
+                return False
             
             return True
             
@@ -321,17 +467,8 @@ class FileManager:
             parsed_period: Period extracted from parsed data (for period_mismatch)
         """
         try:
-            from core.config import Config
-            from datetime import datetime
-            
-            # Create diagnostics directory if it doesn't exist
-            diagnostics_dir = Config.PROJECT_ROOT / 'diagnostics'
-            diagnostics_dir.mkdir(parents=True, exist_ok=True)
-            
-            log_file = diagnostics_dir / 'import_duplicates.log'
-            
             # Format timestamp
-            timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+            timestamp = _event_timestamp()
             
             # Build log entry
             log_parts = [f"[{timestamp}] {filename} — {reason}"]
@@ -353,9 +490,9 @@ class FileManager:
             
             log_entry = " | ".join(log_parts) + "\n"
             
-            # Write to log file
-            with open(log_file, 'a', encoding='utf-8') as f:
-                f.write(log_entry)
+            # One line-buffered write to the kept-open log file
+            with _IMPORT_EVENTS_LOCK:
+                _import_events_log().write(log_entry)
             
             logger.info(f"Logged import event: {event_type} for {filename}")
             
@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""
+Unit tests for FileManager broker detection
+"""
+
+import re
+import random
+import sys
+import unittest
+from pathlib import Path
+
+# Add project root to Python path
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from core.utils.file_manager import FileManager
+
+# Filler longer than any header a broker name could be expected in
+LONG_PADDING = "x" * 65536
+
+def baseline_broker_scores(broker_patterns, content: str, file_name: str = ""):
+    """Broker scores as the original detect_broker computed them (full text, re.findall)"""
+    text_to_analyze = f"{file_name} {content}".lower()
+    
+    broker_scores = {}
+    for broker, patterns in broker_patterns.items():
+        score = 0
+        for pattern in patterns:
+            score += len(re.findall(pattern, text_to_analyze, re.IGNORECASE))
+        if score > 0:
+            broker_scores[broker] = score
+    return broker_scores
+
+def baseline_detect_broker(broker_patterns, content: str, file_name: str = ""):
+    """Broker the original detect_broker returned"""
+    broker_scores = baseline_broker_scores(broker_patterns, content, file_name)
+    if broker_scores:
+        return max(broker_scores, key=broker_scores.get)
+    return None
+
+class TestBrokerDetection(unittest.TestCase):
+    """Broker scoring and detection must match the original full-text regex scan"""
+    
+    # Texts with nested, overlapping and self-overlapping keywords
+    SAMPLES = [
+        "",
+        "Брокерский отчет банк ВТБ Капитал",
+        "Отчет брокера Сбербанк за 2023-07",
+        "альфальфа альфа-банк ALPHA",
+        "Т-Банк и т банк, Tinkoff / Тинькофф",
+        "ГАЗПРОМБАНК газпром Gazprombank",
+        "сберсбер sbersber втбвтб",
+        "no broker mentioned here",
+    ]
+    
+    def setUp(self):
+        """Set up test fixtures"""
+        self.file_manager = FileManager()
+        self.patterns = self.file_manager.broker_patterns
+    
+    def test_scores_match_baseline(self):
+        """Keyword counts equal the original per-keyword re.findall counts"""
+        for text in self.SAMPLES:
+            with self.subTest(text=text):
+                self.assertEqual(self.file_manager._score_brokers(f" {text}".lower()),
+                                 baseline_broker_scores(self.patterns, text))
+    
+    def test_scores_match_baseline_randomized(self):
+        """Randomly stitched keyword fragments score the same as the baseline"""
+        keywords = [keyword for patterns in self.patterns.values() for keyword in patterns]
+        fragments = keywords + ["-", " ", "банк", "альф", "x", "\n"]
+        rng = random.Random(1001)
+        for _ in range(500):
+            text = "".join(rng.choice(fragments) for _ in range(rng.randint(0, 40)))
+            with self.subTest(text=text):
+                self.assertEqual(self.file_manager._score_brokers(f" {text}".lower()),
+                                 baseline_broker_scores(self.patterns, text))
+    
+    def test_detect_broker_within_head(self):
+        """Content shorter than the scan window detects the baseline broker"""
+        for text in self.SAMPLES:
+            with self.subTest(text=text):
+                self.assertEqual(self.file_manager.detect_broker(text, "report.html"),
+                                 baseline_detect_broker(self.patterns, text, "report.html"))
+    
+    def test_detect_broker_file_name(self):
+        """File name keywords count toward detection"""
+        self.assertEqual(self.file_manager.detect_broker("", "VTB_2023-07.html"), "vtb")
+        self.assertEqual(self.file_manager.detect_broker("", "VTB_2023-07.html"),
+                         baseline_detect_broker(self.patterns, "", "VTB_2023-07.html"))
+    
+    def test_detect_broker_named_after_head(self):
+        """A broker named only deep in the document is still found"""
+        content = LONG_PADDING + " Тинькофф tinkoff альфа"
+        self.assertEqual(self.file_manager.detect_broker(content, "report.html"), "tinkoff")
+        self.assertEqual(self.file_manager.detect_broker(content, "report.html"),
+                         baseline_detect_broker(self.patterns, content, "report.html"))
+    
+    def test_detect_broker_generic_head_outvoted(self):
+        """Generic sber phrases in the header lose to a broker named more often later"""
+        content = "Брокерский отчет\n" + LONG_PADDING + " ВТБ vtb втб капитал"
+        self.assertEqual(self.file_manager.detect_broker(content, "report.html"), "vtb")
+        self.assertEqual(self.file_manager.detect_broker(content, "report.html"),
+                         baseline_detect_broker(self.patterns, content, "report.html"))
+    
+    def test_detect_broker_no_match(self):
+        """No keyword anywhere returns None"""
+        content = LONG_PADDING
+        self.assertIsNone(self.file_manager.detect_broker(content, "report.html"))
+
+if __name__ == '__main__':
+    unittest.main()